@@ -0,0 +1,85 @@
+# -*- coding: UTF-8 -*-
+"""
+"""
+import hashlib
+import json
+from functools import wraps
+
+from django.core.cache import caches
+from rest_framework import status
+from rest_framework.exceptions import APIException, ValidationError
+from rest_framework.response import Response
+
+HEADER = 'HTTP_IDEMPOTENCY_KEY'
+MAX_KEY_LENGTH = 255
+
+# seconds a key stays locked by a request which never finished, e.g. when
+# server process was killed in the middle
+IN_PROGRESS_TIMEOUT = 60
+
+
+class IdempotencyConflict(APIException):
+    status_code = status.HTTP_409_CONFLICT
+    default_detail = 'Request with this Idempotency-Key is in progress.'
+    default_code = 'idempotency_conflict'
+
+
+class IdempotencyKeyReused(APIException):
+    status_code = status.HTTP_422_UNPROCESSABLE_ENTITY
+    default_detail = 'Idempotency-Key was used for a different request.'
+    default_code = 'idempotency_key_reused'
+
+
+def _fingerprint(request):
+    body = json.dumps(request.data, sort_keys=True, default=str)
+    return hashlib.sha1(body.encode()).hexdigest()
+
+
+def idempotent(func):
+    """Store successful response of view action by Idempotency-Key header
+
+    Repeated request with the same key gets the stored response without
+    running the action. Keys are scoped to the user and the request path,
+    failed requests release the key so they can be retried.
+    """
+
+    @wraps(func)
+    def wrapper(self, request, *args, **kwargs):
+        key = request.META.get(HEADER)
+        if not key:
+            return func(self, request, *args, **kwargs)
+        if len(key) > MAX_KEY_LENGTH:
+            raise ValidationError(
+                f'Idempotency-Key is longer than {MAX_KEY_LENGTH}'
+            )
+
+        cache = caches['idempotency']
+        cache_key = 'idempotency:' + hashlib.sha1(
+            f'{request.user.pk}:{request.method}:{request.path}:{key}'
+            .encode()
+        ).hexdigest()
+        fingerprint = _fingerprint(request)
+        if not cache.add(cache_key, (fingerprint, None, None),
+                         IN_PROGRESS_TIMEOUT):
+            stored_fingerprint, status_code, data = \
+                cache.get(cache_key) or (fingerprint, None, None)
+            if stored_fingerprint != fingerprint:
+                raise IdempotencyKeyReused()
+            if status_code is None:
+                raise IdempotencyConflict()
+            response = Response(data, status=status_code)
+            response['Idempotent-Replayed'] = 'true'
+            return response
+
+        try:
+            response = func(self, request, *args, **kwargs)
+        except Exception:
+            cache.delete(cache_key)
+            raise
+        if status.is_success(response.status_code):
+            cache.set(cache_key,
+                      (fingerprint, response.status_code, response.data))
+        else:
+            cache.delete(cache_key)
+        return response
+    return wrapper
@@ -0,0 +1,103 @@
+# -*- coding: UTF-8 -*-
+"""
+"""
+import io
+import re
+import zlib
+
+from django.conf import settings
+from django.http import HttpResponse
+from django.utils.cache import patch_vary_headers
+
+RE_ACCEPT_ENCODING = re.compile(r'\s*([^\s;,]+)\s*(?:;\s*q=([0-9.]+))?')
+
+# zlib window bits for each supported content coding
+WBITS = {
+    'gzip': 16 + zlib.MAX_WBITS,
+    'deflate': zlib.MAX_WBITS,
+}
+
+
+def accepted_encoding(header):
+    """Pick supported content coding with the highest quality
+
+    :param header: Accept-Encoding header value
+    :return: gzip, deflate or None
+    """
+    best, best_quality = None, 0
+    for coding, quality in RE_ACCEPT_ENCODING.findall(header):
+        coding = coding.lower()
+        try:
+            quality = float(quality) if quality else 1
+        except ValueError:
+            continue
+        if coding in WBITS and quality > best_quality:
+            best, best_quality = coding, quality
+    return best
+
+
+class CompressionMiddleware:
+    """Compresses responses and decompresses request bodies
+
+    Responses smaller than COMPRESSION_MIN_SIZE bytes and streaming
+    responses are sent as is. Request bodies sent with gzip or deflate
+    Content-Encoding are decoded before the view reads them.
+    """
+
+    def __init__(self, get_response):
+        self.get_response = get_response
+        self.min_size = getattr(settings, 'COMPRESSION_MIN_SIZE', 1024)
+        self.level = getattr(settings, 'COMPRESSION_LEVEL', 6)
+
+    def __call__(self, request):
+        error = self.decompress_request(request)
+        if error:
+            return error
+        response = self.get_response(request)
+        return self.compress_response(request, response)
+
+    def decompress_request(self, request):
+        coding = request.META.get('HTTP_CONTENT_ENCODING', '').lower()
+        if not coding or coding == 'identity':
+            return None
+        if coding not in WBITS:
+            return HttpResponse(f'Unsupported Content-Encoding {coding}',
+                                status=415)
+
+        limit = settings.DATA_UPLOAD_MAX_MEMORY_SIZE
+        decompressor = zlib.decompressobj(WBITS[coding])
+        try:
+            body = decompressor.decompress(request.body, limit or 0)
+        except zlib.error:
+            return HttpResponse('Malformed request body', status=400)
+        if decompressor.unconsumed_tail:
+            return HttpResponse('Request body is too large', status=413)
+
+        request._body = body
+        request._stream = io.BytesIO(body)
+        request.META['CONTENT_LENGTH'] = str(len(body))
+        del request.META['HTTP_CONTENT_ENCODING']
+        return None
+
+    def compress_response(self, request, response):
+        if response.streaming or response.has_header('Content-Encoding') or \
+                len(response.content) < self.min_size:
+            return response
+        patch_vary_headers(response, ('Accept-Encoding',))
+        coding = accepted_encoding(request.META.get('HTTP_ACCEPT_ENCODING',
+                                                    ''))
+        if not coding:
+            return response
+
+        compressor = zlib.compressobj(self.level, zlib.DEFLATED, WBITS[coding])
+        content = compressor.compress(response.content) + compressor.flush()
+        if len(content) >= len(response.content):
+            return response
+
+        response.content = content
+        response['Content-Length'] = str(len(content))
+        response['Content-Encoding'] = coding
+        etag = response.get('ETag')
+        if etag and etag.startswith('"'):
+            response['ETag'] = 'W/' + etag
+        return response
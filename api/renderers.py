@@ -0,0 +1,45 @@
+# -*- coding: UTF-8 -*-
+"""
+"""
+import json
+
+from rest_framework.renderers import BaseRenderer, JSONRenderer
+
+try:
+    import orjson
+except ImportError:
+    orjson = None
+
+
+class EventStreamRenderer(BaseRenderer):
+    """Negotiates text/event-stream for streaming views
+
+    Streaming responses bypass rendering, other responses such as errors
+    are sent as a single error event.
+    """
+    media_type = 'text/event-stream'
+    format = 'event-stream'
+    charset = 'utf-8'
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        return f'event: error\ndata: {json.dumps(data)}\n\n'.encode()
+
+
+class FastJSONRenderer(JSONRenderer):
+    """JSONRenderer serializing with orjson when it is installed
+
+    Falls back to the standard renderer for indented output.
+    """
+
+    def render(self, data, accepted_media_type=None, renderer_context=None):
+        renderer_context = renderer_context or {}
+        if orjson is None or data is None or \
+                self.get_indent(accepted_media_type, renderer_context):
+            return super().render(data, accepted_media_type,
+                                  renderer_context)
+
+        ret = orjson.dumps(data, default=self.encoder_class().default,
+                           option=orjson.OPT_NON_STR_KEYS)
+        # keep output a strict javascript subset like JSONRenderer does
+        return ret.replace('\u2028'.encode(), b'\\u2028') \
+            .replace('\u2029'.encode(), b'\\u2029')
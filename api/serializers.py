@@ -1,19 +1,29 @@
 # -*- coding: UTF-8 -*-
 """
 """
-from datetime import datetime
-
 from rest_framework import serializers
 from django.contrib.auth.models import User
 
-from teste.models import Post, Vote
+from teste.models import ArchivedVote, Post, Vote
 
 
 class UserSerializer(serializers.ModelSerializer):
+    # annotated by UserViewSet from the teste.AuthorStats row
+    posts_count = serializers.IntegerField(read_only=True)
+    likes_received = serializers.IntegerField(read_only=True)
+    dislikes_received = serializers.IntegerField(read_only=True)
+    votes_cast = serializers.IntegerField(read_only=True)
 
     class Meta:
         model = User
-        fields = ('username', 'email', 'groups', 'id')
+        fields = ('username', 'email', 'groups', 'id', 'posts_count',
+                  'likes_received', 'dislikes_received', 'votes_cast')
+
+
+class BulkUsersSerializer(serializers.Serializer):
+    count = serializers.IntegerField(min_value=1, max_value=1000)
+    password = serializers.CharField(required=False)
+    prefix = serializers.RegexField(r'^[\w.@+-]{1,100}$', default='bot')
 
 
 class VoteSerializer(serializers.ModelSerializer):
@@ -23,14 +33,27 @@ class VoteSerializer(serializers.ModelSerializer):
         fields = '__all__'
 
 
+class ArchivedVoteSerializer(serializers.ModelSerializer):
+
+    class Meta:
+        model = ArchivedVote
+        fields = '__all__'
+
+
 class PostSerializer(serializers.ModelSerializer):
+    # include counter shards not yet folded into the post
+    likes = serializers.IntegerField(source='total_likes', read_only=True)
+    dislikes = serializers.IntegerField(source='total_dislikes',
+                                        read_only=True)
 
     class Meta:
         model = Post
         fields = '__all__'
+        read_only_fields = ('counter_shards',)
 
     def update(self, instance, validated_data):
         instance.content = validated_data.get('content', instance.content)
         instance.title = validated_data.get('title', instance.title)
-        instance.updated_on = validated_data.get('updated_on', datetime.now())
+        # writes only changed columns, updated_on is set by auto_now
+        instance.save()
         return instance
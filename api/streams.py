@@ -0,0 +1,61 @@
+# -*- coding: UTF-8 -*-
+"""
+"""
+import json
+import time
+
+from django.conf import settings
+from django.contrib.contenttypes.models import ContentType
+
+from teste.events import counters
+from teste.models import Post
+
+
+def server_event(event, data):
+    """Format server-sent event
+
+    :param event: event name
+    :param data: JSON serializable data
+    :return: str
+    """
+    return f'event: {event}\ndata: {json.dumps(data)}\n\n'
+
+
+def post_counter_events(post_ids):
+    """Stream of like/dislike counters of posts
+
+    Starts with current counters of all posts, afterwards sends counters
+    of posts which got votes. Changes are collected for
+    COUNTER_STREAM_INTERVAL seconds so a busy post produces at most one
+    event per interval.
+
+    :param post_ids: ids of posts to watch
+    :return: generator of server-sent events
+    """
+    content_type = ContentType.objects.get_for_model(Post)
+    subscription = counters.subscribe(
+        (content_type.pk, post_id) for post_id in post_ids
+    )
+    try:
+        changed = set(post_ids)
+        while True:
+            if changed:
+                posts = Post.objects.with_counters().filter(
+                    pk__in=changed
+                ).order_by('pk').values_list('id', 'likes', 'dislikes',
+                                             'shard_likes', 'shard_dislikes')
+                yield server_event('counters', [
+                    {'id': pk, 'likes': likes + shard_likes,
+                     'dislikes': dislikes + shard_dislikes}
+                    for pk, likes, dislikes, shard_likes, shard_dislikes
+                    in posts
+                ])
+                time.sleep(settings.COUNTER_STREAM_INTERVAL)
+            changed = {
+                object_id for _, object_id in
+                subscription.wait(settings.COUNTER_STREAM_HEARTBEAT)
+            }
+            if not changed:
+                yield ': keep-alive\n\n'
+    finally:
+        counters.unsubscribe(subscription)
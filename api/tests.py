@@ -1,3 +1,235 @@
-from django.test import TestCase
+from unittest import mock
 
-# Create your tests here.
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.core.cache import caches
+from django.db import OperationalError
+from django.test import TestCase, override_settings
+from django.utils import timezone
+from rest_framework.test import APIClient
+
+from api.throttling import TokenBucket, TokenBucketThrottle
+from api.views import PostViewSet
+from teste.archiving import archive_votes
+from teste.models import ArchivedVote, AuthorStats, Post, Vote
+
+
+class VoteTest(TestCase):
+
+    def setUp(self):
+        author = User.objects.create_user('author', 'author@example.com',
+                                          'password')
+        self.voter = User.objects.create_user('voter', 'voter@example.com',
+                                              'password')
+        self.post = Post.objects.create(title='First post', content='text',
+                                        author=author)
+        self.client = APIClient()
+        self.client.force_authenticate(self.voter)
+
+    def _like(self):
+        return self.client.post(f'/api/v1/posts/{self.post.pk}/like/')
+
+    def _create_vote(self):
+        return self.client.post('/api/v1/votes/', {
+            'vote': 1, 'author': self.voter.pk, 'object_id': self.post.pk,
+            'content_type': ContentType.objects.get_for_model(Post).pk,
+        }, format='json')
+
+    def test_repeated_vote_is_rejected(self):
+        self.assertEqual(self._like().status_code, 200)
+        self.assertEqual(self._like().status_code, 400)
+        self.assertEqual(Vote.objects.count(), 1)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).likes, 1)
+
+    def test_vote_repeating_archived_one_is_rejected(self):
+        self.assertEqual(self._like().status_code, 200)
+        archive_votes(timezone.now())
+        self.assertEqual(ArchivedVote.objects.count(), 1)
+
+        self.assertEqual(self._like().status_code, 400)
+        self.assertEqual(Vote.objects.count(), 0)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).likes, 1)
+        self.assertEqual(
+            AuthorStats.objects.get(pk=self.voter.pk).votes_cast, 1
+        )
+
+    def test_votes_endpoint_rejects_repeated_vote(self):
+        self.assertEqual(self._create_vote().status_code, 201)
+        self.assertEqual(self._create_vote().status_code, 400)
+        archive_votes(timezone.now())
+
+        self.assertEqual(self._create_vote().status_code, 400)
+        self.assertEqual(Vote.objects.count(), 0)
+        self.assertEqual(Post.objects.get(pk=self.post.pk).likes, 1)
+
+
+class TokenBucketTest(TestCase):
+
+    def test_refill_is_capped_by_capacity(self):
+        bucket = TokenBucket(rate=2, capacity=3, now=0)
+        bucket.tokens = 0
+        bucket.refill(1)
+        self.assertEqual(bucket.tokens, 2)
+        bucket.refill(10)
+        self.assertEqual(bucket.tokens, 3)
+
+    def test_wait_until_next_token(self):
+        bucket = TokenBucket(rate=2, capacity=3, now=0)
+        self.assertEqual(bucket.wait(), 0)
+        bucket.tokens = 0.5
+        self.assertEqual(bucket.wait(), 0.25)
+
+
+@override_settings(TOKEN_BUCKET_THROTTLE={
+    'posts': {'user': ('1/m', 2), 'global': ('100/s', 100)},
+})
+class ThrottleTest(TestCase):
+
+    def setUp(self):
+        TokenBucketThrottle._buckets.clear()
+        TokenBucketThrottle.shed.clear()
+        self.user = User.objects.create_user('author', 'author@example.com',
+                                             'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+        self.now = 1000.0
+        patcher = mock.patch('api.throttling.time.monotonic',
+                             lambda: self.now)
+        patcher.start()
+        self.addCleanup(patcher.stop)
+
+    def _create_post(self, indx):
+        return self.client.post('/api/v1/posts/', {
+            'title': f'Post {indx}', 'content': 'text',
+            'author': self.user.pk,
+        }, format='json')
+
+    def test_burst_then_429_with_retry_after(self):
+        self.assertEqual(self._create_post(1).status_code, 201)
+        self.assertEqual(self._create_post(2).status_code, 201)
+        response = self._create_post(3)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '60')
+        self.assertEqual(TokenBucketThrottle.shed_counts(),
+                         {'posts': {'user': 1}})
+
+    def test_bucket_refills_over_time(self):
+        for indx in range(2):
+            self._create_post(indx)
+        self.now += 30
+        response = self._create_post(2)
+        self.assertEqual(response.status_code, 429)
+        self.assertEqual(response['Retry-After'], '30')
+        self.now += 30
+        self.assertEqual(self._create_post(3).status_code, 201)
+
+    def test_shed_counters_are_staff_only(self):
+        self.assertEqual(self.client.get('/api/v1/throttling/').status_code,
+                         403)
+        self.user.is_staff = True
+        self.user.save()
+        response = self.client.get('/api/v1/throttling/')
+        self.assertEqual(response.status_code, 200)
+        self.assertEqual(response.data, {'shed': {}})
+
+
+class ChangesTest(TestCase):
+
+    def setUp(self):
+        author = User.objects.create_user('author', 'author@example.com',
+                                          'password')
+        self.posts = [
+            Post.objects.create(title=f'Post {indx}', content='text',
+                                author=author)
+            for indx in range(5)
+        ]
+        # posts changed by one statement share change_seq
+        Post.objects.filter(pk__in=[post.pk for post in self.posts[1:4]]) \
+            .update(change_seq=self.posts[1].change_seq)
+        self.client = APIClient()
+
+    def _changes(self, **params):
+        response = self.client.get('/api/v1/posts/changes/', params)
+        self.assertEqual(response.status_code, 200)
+        return response.data
+
+    def test_pages_through_equal_change_seq(self):
+        seen, cursor, more = [], '0', True
+        while more:
+            page = self._changes(since=cursor, limit=2)
+            seen += [post['id'] for post in page['results']]
+            cursor, more = page['cursor'], page['more']
+        self.assertEqual(seen, [post.pk for post in self.posts])
+        last = Post.objects.get(pk=self.posts[-1].pk)
+        self.assertEqual(cursor, f'{last.change_seq}:{last.pk}')
+        self.assertEqual(self._changes(since=cursor)['results'], [])
+
+    def test_cursor_inside_equal_change_seq(self):
+        change_seq = self.posts[1].change_seq
+        page = self._changes(since=f'{change_seq}:{self.posts[2].pk}')
+        self.assertEqual([post['id'] for post in page['results']],
+                         [post.pk for post in self.posts[3:]])
+
+    def test_plain_change_seq(self):
+        page = self._changes(since=self.posts[1].change_seq)
+        self.assertEqual([post['id'] for post in page['results']],
+                         [self.posts[4].pk])
+        self.assertFalse(page['more'])
+
+    def test_malformed_cursor(self):
+        response = self.client.get('/api/v1/posts/changes/',
+                                   {'since': '1:x'})
+        self.assertEqual(response.status_code, 400)
+
+
+class IdempotencyTest(TestCase):
+
+    def setUp(self):
+        caches['idempotency'].clear()
+        TokenBucketThrottle._buckets.clear()
+        self.user = User.objects.create_user('author', 'author@example.com',
+                                             'password')
+        self.client = APIClient()
+        self.client.force_authenticate(self.user)
+
+    def _create_post(self, key, title='First post'):
+        return self.client.post('/api/v1/posts/', {
+            'title': title, 'content': 'text', 'author': self.user.pk,
+        }, format='json', HTTP_IDEMPOTENCY_KEY=key)
+
+    def test_repeated_key_replays_response(self):
+        created = self._create_post('key')
+        replayed = self._create_post('key')
+        self.assertEqual(replayed.status_code, 201)
+        self.assertEqual(replayed['Idempotent-Replayed'], 'true')
+        self.assertEqual(replayed.data['id'], created.data['id'])
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_key_reused_for_different_body(self):
+        self._create_post('key')
+        self.assertEqual(self._create_post('key', 'Other').status_code, 422)
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_key_in_progress(self):
+        perform_create = PostViewSet.perform_create
+        nested = []
+
+        def perform_create_twice(view, serializer):
+            nested.append(self._create_post('key').status_code)
+            perform_create(view, serializer)
+
+        with mock.patch.object(PostViewSet, 'perform_create',
+                               perform_create_twice):
+            self.assertEqual(self._create_post('key').status_code, 201)
+        self.assertEqual(nested, [409])
+        self.assertEqual(Post.objects.count(), 1)
+
+    def test_failed_request_releases_key(self):
+        with mock.patch.object(PostViewSet, 'perform_create',
+                               side_effect=OperationalError('locked')):
+            with self.assertRaises(OperationalError):
+                self._create_post('key')
+        response = self._create_post('key')
+        self.assertEqual(response.status_code, 201)
+        self.assertNotIn('Idempotent-Replayed', response)
+        self.assertEqual(Post.objects.count(), 1)
@@ -0,0 +1,127 @@
+# -*- coding: UTF-8 -*-
+"""
+"""
+import threading
+import time
+from collections import Counter, OrderedDict
+
+from django.conf import settings
+from rest_framework.throttling import BaseThrottle
+
+DURATIONS = {'s': 1, 'm': 60, 'h': 3600, 'd': 86400}
+
+# least recently used buckets are dropped when there are more than this
+# amount, they are usually full anyway
+MAX_BUCKETS = 10000
+
+
+def parse_rate(rate):
+    """Convert rate like 10/s or 100/min into tokens per second
+
+    :param rate: string
+    :return: float
+    """
+    amount, period = rate.split('/')
+    return int(amount) / DURATIONS[period[0]]
+
+
+class TokenBucket:
+    __slots__ = ('rate', 'capacity', 'tokens', 'updated')
+
+    def __init__(self, rate, capacity, now):
+        self.rate = rate
+        self.capacity = capacity
+        self.tokens = capacity
+        self.updated = now
+
+    def refill(self, now):
+        self.tokens = min(self.capacity,
+                          self.tokens + (now - self.updated) * self.rate)
+        self.updated = now
+
+    def wait(self):
+        """Seconds until a token is available"""
+        return max(0, (1 - self.tokens) / self.rate)
+
+
+class TokenBucketThrottle(BaseThrottle):
+    """Per-user and global token buckets kept in process memory
+
+    Rates and burst sizes are read from TOKEN_BUCKET_THROTTLE setting for
+    the scope of the throttle. A request has to get a token from both
+    buckets, rejected requests are counted in `shed`.
+    """
+
+    scope = None
+
+    _buckets = OrderedDict()
+    _lock = threading.Lock()
+    shed = Counter()
+
+    def __init__(self):
+        self._wait = None
+
+    def allow_request(self, request, view):
+        rates = settings.TOKEN_BUCKET_THROTTLE.get(self.scope)
+        if not rates:
+            return True
+
+        if request.user and request.user.is_authenticated:
+            ident = request.user.pk
+        else:
+            ident = self.get_ident(request)
+        now = time.monotonic()
+        with self._lock:
+            buckets = {
+                kind: self._bucket(kind, key, rates[kind], now)
+                for kind, key in (('user', ident), ('global', None))
+                if kind in rates
+            }
+            self._wait = max(
+                (bucket.wait() for bucket in buckets.values()), default=0
+            )
+            if self._wait:
+                for kind, bucket in buckets.items():
+                    if bucket.wait():
+                        self.shed[(self.scope, kind)] += 1
+                return False
+            for bucket in buckets.values():
+                bucket.tokens -= 1
+        return True
+
+    def _bucket(self, kind, key, rate, now):
+        bucket_key = (self.scope, kind, key)
+        bucket = self._buckets.get(bucket_key)
+        if bucket is None:
+            if len(self._buckets) >= MAX_BUCKETS:
+                self._buckets.popitem(last=False)
+            rate, capacity = rate
+            bucket = TokenBucket(parse_rate(rate), capacity, now)
+            self._buckets[bucket_key] = bucket
+        else:
+            self._buckets.move_to_end(bucket_key)
+            bucket.refill(now)
+        return bucket
+
+    def wait(self):
+        return self._wait
+
+    @classmethod
+    def shed_counts(cls):
+        """Rejected requests of this process by scope and bucket kind
+
+        :return: dict like {'votes': {'user': 3}}
+        """
+        counts = {}
+        with cls._lock:
+            for (scope, kind), amount in cls.shed.items():
+                counts.setdefault(scope, {})[kind] = amount
+        return counts
+
+
+class PostCreateThrottle(TokenBucketThrottle):
+    scope = 'posts'
+
+
+class VoteThrottle(TokenBucketThrottle):
+    scope = 'votes'
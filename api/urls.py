@@ -17,6 +17,7 @@ router.register(r'votes', views.VoteViewSet)
 
 urlpatterns = [
     path('', include(router.urls)),
+    path('throttling/', views.ThrottleStatsView.as_view()),
     url(r'^auth/refresh', refresh_jwt_token),
     url(r'^auth/verify', verify_jwt_token),
     url(r'^auth/registration/', include('rest_auth.registration.urls')),
@@ -1,14 +1,32 @@
 from django.contrib.auth.models import User
-from rest_framework import viewsets, mixins
+from django.db.models import F
+from django.conf import settings
+from django.db.models.functions import Coalesce
+from django.http import StreamingHttpResponse
+from django.utils.crypto import get_random_string
+from rest_framework import viewsets, mixins, status
 from rest_framework.decorators import action
+from rest_framework.exceptions import ValidationError
+from rest_framework.filters import OrderingFilter
 from rest_framework.permissions import IsAuthenticatedOrReadOnly, \
-    IsAuthenticated
+    IsAuthenticated, IsAdminUser
 from rest_framework.response import Response
+from rest_framework.views import APIView
 
+from .idempotency import idempotent
 from .permissions import IsOwner
-from .serializers import UserSerializer, PostSerializer, VoteSerializer
+from .renderers import EventStreamRenderer, FastJSONRenderer
+from .streams import post_counter_events
+from .throttling import PostCreateThrottle, TokenBucketThrottle, \
+    VoteThrottle
+from .serializers import UserSerializer, PostSerializer, VoteSerializer, \
+    BulkUsersSerializer, ArchivedVoteSerializer
 
-from teste.models import Post, Vote
+from teste.models import ArchivedVote, DuplicateVote, Post, Vote
+from teste.provisioning import bulk_create_users
+
+AUTHOR_STATS_FIELDS = ('posts_count', 'likes_received', 'dislikes_received',
+                       'votes_cast')
 
 
 class NoModifyModelViewSet(mixins.CreateModelMixin,
@@ -19,42 +37,149 @@ class NoModifyModelViewSet(mixins.CreateModelMixin,
     pass
 
 
+class AuthorStatsOrderingFilter(OrderingFilter):
+    """Orders users by AuthorStats columns instead of their annotations
+
+    Inner join lets the database read users in order of the AuthorStats
+    index rather than sort all of them, every user has a stats row.
+    """
+
+    def filter_queryset(self, request, queryset, view):
+        ordering = self.get_ordering(request, queryset, view)
+        if not ordering:
+            return queryset
+        fields = []
+        for field in ordering:
+            name = field.lstrip('-')
+            if name in AUTHOR_STATS_FIELDS:
+                queryset = queryset.filter(stats__isnull=False)
+                field = field.replace(name, f'stats__{name}')
+            fields.append(field)
+        return queryset.order_by(*fields)
+
+
 class UserViewSet(viewsets.ModelViewSet):
     """
     API endpoint that allows users to be viewed or edited.
     """
-    queryset = User.objects.all().order_by('-date_joined')
+    queryset = User.objects.annotate(
+        **{field: Coalesce(F(f'stats__{field}'), 0)
+           for field in AUTHOR_STATS_FIELDS}
+    ).prefetch_related('groups').order_by('-date_joined')
     serializer_class = UserSerializer
     permission_classes = [IsAuthenticatedOrReadOnly]
+    filter_backends = [AuthorStatsOrderingFilter]
+    ordering_fields = ('date_joined', 'username') + AUTHOR_STATS_FIELDS
 
     @action(methods=['GET'], detail=False)
     def me(self, request, *args, **kwargs):
         self.kwargs.update(pk=request.user.id)
         return self.retrieve(request, *args, **kwargs)
 
+    @action(methods=['POST'], detail=False, permission_classes=[IsAdminUser])
+    def bulk(self, request, *args, **kwargs):
+        """Create test users sharing one password hash with their tokens"""
+        serializer = BulkUsersSerializer(data=request.data)
+        serializer.is_valid(raise_exception=True)
+        users = bulk_create_users(
+            serializer.validated_data['count'],
+            password=serializer.validated_data.get('password') or
+            get_random_string(12),
+            prefix=serializer.validated_data['prefix'],
+        )
+        return Response(users, status=status.HTTP_201_CREATED)
+
 
 class PostViewSet(viewsets.ModelViewSet):
     """
     API endpoint that allows users to be viewed or edited.
     """
-    queryset = Post.objects.all().order_by('-created_on')
+    queryset = Post.objects.with_counters().order_by('-created_on')
     serializer_class = PostSerializer
     permission_classes = [IsOwner]
+    max_changes_limit = 1000
+
+    def get_throttles(self):
+        if self.action == 'create':
+            return [PostCreateThrottle()]
+        return super().get_throttles()
+
+    @idempotent
+    def create(self, request, *args, **kwargs):
+        return super().create(request, *args, **kwargs)
 
     @action(methods=['POST'], detail=True,
-            permission_classes=[IsAuthenticated])
+            permission_classes=[IsAuthenticated],
+            throttle_classes=[VoteThrottle])
+    @idempotent
     def like(self, request, pk, *args, **kwargs):
         return self._vote(request, pk, 1)
 
     @action(methods=['POST'], detail=True,
-            permission_classes=[IsAuthenticated])
+            permission_classes=[IsAuthenticated],
+            throttle_classes=[VoteThrottle])
+    @idempotent
     def dislike(self, request, pk=None, *args, **kwargs):
         return self._vote(request, pk, -1)
 
+    @action(methods=['GET'], detail=False)
+    def changes(self, request, *args, **kwargs):
+        """Posts changed after ?since= cursor in order of change
+
+        Response cursor is passed as `since` of the next request, `more`
+        tells whether there are more changes after this page. Cursor is
+        `<change_seq>:<id>` of the last post, a plain change_seq is
+        accepted as well.
+
+        Votes on posts with counter_shards show up here only after the
+        shards are folded by fold_counter_shards, until then only the
+        counter stream and post reads include them.
+        """
+        since = request.query_params.get('since', '0')
+        try:
+            changed = Post.objects.changed_since(since)
+            limit = int(request.query_params.get('limit', 100))
+            limit = max(1, min(limit, self.max_changes_limit))
+        except ValueError:
+            raise ValidationError('since must be a cursor and limit an '
+                                  'integer')
+        posts = list(changed[:limit + 1])
+        more = len(posts) > limit
+        posts = posts[:limit]
+        return Response({
+            'cursor': f'{posts[-1].change_seq}:{posts[-1].pk}'
+            if posts else since,
+            'more': more,
+            'results': self.get_serializer(posts, many=True).data,
+        })
+
+    @action(methods=['GET'], detail=False,
+            renderer_classes=[EventStreamRenderer, FastJSONRenderer])
+    def stream(self, request, *args, **kwargs):
+        """Server-sent events with counters of posts given by ?ids=1,2,3"""
+        try:
+            post_ids = {int(pk) for pk in
+                        request.query_params.get('ids', '').split(',') if pk}
+        except ValueError:
+            raise ValidationError('ids must be comma separated integers')
+        if not post_ids or \
+                len(post_ids) > settings.COUNTER_STREAM_MAX_POSTS:
+            raise ValidationError(
+                f'from 1 to {settings.COUNTER_STREAM_MAX_POSTS} ids expected'
+            )
+        response = StreamingHttpResponse(post_counter_events(post_ids),
+                                         content_type='text/event-stream')
+        response['Cache-Control'] = 'no-cache'
+        response['X-Accel-Buffering'] = 'no'
+        return response
+
     def _vote(self, request, pk, vote):
         post = self.get_object()
-        vote = Vote.objects.create(content_object=post, vote=vote,
-                                   author=request.user)
+        try:
+            vote = Vote.objects.create(content_object=post, vote=vote,
+                                       author=request.user)
+        except DuplicateVote:
+            raise ValidationError('You have already voted for this post')
         return Response(
             VoteSerializer(vote, context=self.get_serializer_context()).data
         )
@@ -68,3 +193,34 @@ class VoteViewSet(NoModifyModelViewSet):
     serializer_class = VoteSerializer
     permission_classes = [IsOwner]
 
+    def _archived(self):
+        """Archived votes are read only and listed only on ?archived=1"""
+        return self.action in ('list', 'retrieve') and \
+            self.request.query_params.get('archived') in ('1', 'true')
+
+    def get_queryset(self):
+        if self._archived():
+            return ArchivedVote.objects.all().order_by('-created_at')
+        return super().get_queryset()
+
+    def get_serializer_class(self):
+        if self._archived():
+            return ArchivedVoteSerializer
+        return super().get_serializer_class()
+
+    def perform_create(self, serializer):
+        try:
+            serializer.save()
+        except DuplicateVote:
+            raise ValidationError('You have already voted for this object')
+
+
+class ThrottleStatsView(APIView):
+    """
+    API endpoint with requests rejected by token bucket throttles of the
+    process which serves it.
+    """
+    permission_classes = [IsAdminUser]
+
+    def get(self, request, *args, **kwargs):
+        return Response({'shed': TokenBucketThrottle.shed_counts()})
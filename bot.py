@@ -1,15 +1,24 @@
 # -*- coding: UTF-8 -*-
 """
 """
+import base64
+import collections
 import concurrent.futures
+import gzip
+import itertools
+import json
+import math
 import os
 import random
 import re
+import threading
+import time
+import uuid
 from pathlib import Path
 import string
 from configparser import ConfigParser
 from functools import wraps
-from typing import AnyStr, List, Any
+from typing import AnyStr, List, Any, Iterator
 
 import requests
 
@@ -18,6 +27,37 @@ CONFIG_PATH = (
     os.path.join(os.sep, 'etc')
 )
 
+# operations issued by open loop workers with their relative weights
+OPEN_LOOP_MIX = (
+    ('get_post', 6),
+    ('like_post', 2),
+    ('dislike_post', 2),
+)
+
+# refresh pooled JWT tokens which expire sooner than this amount of seconds
+TOKEN_REFRESH_MARGIN = 300
+
+# login responses meaning pooled user no longer exists or its password
+# changed, e.g. after database of api server was recreated
+LOGIN_REJECTED_STATUSES = (400, 401, 403)
+
+# request fields which are never written to traffic records
+RECORD_REDACTED_FIELDS = ('password', 'password1', 'password2', 'token')
+
+# requests which can be sent again without changing result
+IDEMPOTENT_METHODS = ('GET', 'HEAD', 'OPTIONS', 'PUT', 'DELETE')
+
+# statuses of responses to retry idempotent requests on, throttled (429)
+# requests are retried for any method since server rejects them before work,
+# 409 is returned while request with the same Idempotency-Key is in progress,
+# 500 such as a locked database is safe to retry for keyed requests as well
+# since the key is released only after the failed transaction rolled back
+RETRY_STATUSES = (409, 429, 500, 502, 503, 504)
+MAX_RETRIES = 4
+# seconds, base and upper bound of exponential backoff between retries
+BACKOFF_BASE = 0.1
+BACKOFF_CAP = 5
+
 
 def reduce_slashes(url: AnyStr) -> AnyStr:
     """Reduce slashes in url
@@ -67,6 +107,200 @@ class ApiException(Exception):
         """
         return self._errors
 
+    @property
+    def status_code(self) -> int:
+        """HTTP status code of failed response
+
+        :return: int or None if request was not sent
+        """
+        return self._resp.status_code
+
+
+class TrafficRecorder:
+    """Appends api requests to JSON lines file
+
+    Every line is written with a single write call to file opened in append
+    mode so several processes can record into the same file.
+    """
+
+    def __init__(self, path: AnyStr):
+        self.path = path
+        self._fd = os.open(path, os.O_WRONLY | os.O_APPEND | os.O_CREAT,
+                           0o644)
+
+    def write(self, **entry) -> None:
+        """Write single request entry
+
+        :param entry: request details
+        :return: None
+        """
+        os.write(self._fd, (json.dumps(entry) + '\n').encode())
+
+    def close(self) -> None:
+        """Close record file
+
+        :return: None
+        """
+        os.close(self._fd)
+
+
+class RunStats:
+    """Thread safe counters of requests made by bot clients
+
+    """
+
+    def __init__(self):
+        self._counter = collections.Counter()
+        self._lock = threading.Lock()
+
+    def add(self, name: AnyStr, amount: int = 1) -> None:
+        """Increase counter
+
+        :param name: requests, retries, failed or dropped
+        :param amount:
+        :return: None
+        """
+        with self._lock:
+            self._counter[name] += amount
+
+    def __getitem__(self, name: AnyStr) -> int:
+        return self._counter[name]
+
+
+class AdaptiveLimiter:
+    """Limits amount of concurrent requests with AIMD
+
+    Like TCP congestion control the limit grows by one request per round
+    trip while responses are successful and faster than target_latency and
+    is multiplied by backoff_ratio when a request fails or is slow. Requests
+    started before the last decrease do not decrease the limit again so a
+    burst of errors from one overloaded moment counts once.
+    """
+
+    def __init__(self, initial: float = 4, minimum: float = 1,
+                 maximum: float = 100, target_latency: float = 0.5,
+                 backoff_ratio: float = 0.5):
+        self.minimum = minimum
+        self.maximum = max(minimum, maximum)
+        self.limit = min(max(initial, minimum), self.maximum)
+        self.target_latency = target_latency
+        self.backoff_ratio = backoff_ratio
+        self.lowest = self.highest = self.limit
+        self.decreases = 0
+        self._in_flight = 0
+        self._decreased_at = 0
+        self._condition = threading.Condition()
+
+    def acquire(self) -> float:
+        """Wait until one more request fits into the limit
+
+        :return: monotonic time request started at
+        """
+        with self._condition:
+            while self._in_flight >= int(self.limit):
+                self._condition.wait()
+            self._in_flight += 1
+        return time.monotonic()
+
+    def release(self, started: float, failed: bool = False) -> None:
+        """Finish request and adjust the limit
+
+        :param started: value returned by acquire
+        :param failed: request failed because of server overload
+        :return: None
+        """
+        latency = time.monotonic() - started
+        with self._condition:
+            self._in_flight -= 1
+            if failed or latency > self.target_latency:
+                if started >= self._decreased_at:
+                    self.limit = max(self.minimum,
+                                     self.limit * self.backoff_ratio)
+                    self.lowest = min(self.lowest, self.limit)
+                    self.decreases += 1
+                    self._decreased_at = time.monotonic()
+            else:
+                self.limit = min(self.maximum, self.limit + 1 / self.limit)
+                self.highest = max(self.highest, self.limit)
+            self._condition.notify_all()
+
+
+def backoff_delay(attempt: int, retry_after: AnyStr = None) -> float:
+    """Seconds to wait before retry, exponential backoff with full jitter
+
+    :param attempt: number of failed attempt starting from 1
+    :param retry_after: value of Retry-After header, used as lower bound
+    :return: seconds
+    """
+    delay = random.uniform(0, min(BACKOFF_CAP, BACKOFF_BASE * 2 ** attempt))
+    try:
+        return max(delay, float(retry_after))
+    except (TypeError, ValueError) as _:
+        return delay
+
+
+def token_expiration(token: AnyStr) -> float:
+    """Get expiration time of JWT token without verifying it
+
+    :param token: JWT token
+    :return: unix timestamp
+    """
+    payload = token.split('.')[1]
+    payload += '=' * (-len(payload) % 4)
+    return json.loads(base64.urlsafe_b64decode(payload))['exp']
+
+
+class UserPool:
+    """Users registered by previous bot runs
+
+    Users are stored in JSON file per api url together with passwords and
+    last known JWT tokens so next runs can skip registration.
+    """
+
+    def __init__(self, path: AnyStr):
+        self.path = path
+        self._users = {}
+        if os.path.isfile(path):
+            with open(path, encoding='utf-8') as pool:
+                self._users = json.load(pool)
+
+    def users(self, url: AnyStr) -> List:
+        """Stored users for api server
+
+        :param url: url to Api server
+        :return: list of dict with user details
+        """
+        return [DictWrapper(user) for user in self._users.get(url, [])]
+
+    def save(self, url: AnyStr, users: List, removed: List = ()) -> None:
+        """Add or update users for api server and write pool file
+
+        :param url: url to Api server
+        :param users: list of dict with user details
+        :param removed: usernames to drop, e.g. rejected by the server
+        :return: None
+        """
+        stored = {user['username']: user for user in self._users.get(url, [])
+                  if user['username'] not in removed}
+        stored.update((user['username'], dict(user)) for user in users)
+        self._users[url] = list(stored.values())
+        tmp_path = f'{self.path}.tmp'
+        with open(tmp_path, 'w', encoding='utf-8') as pool:
+            json.dump(self._users, pool, indent=1)
+        os.replace(tmp_path, self.path)
+
+
+def read_traffic(path: AnyStr) -> List:
+    """Read recorded requests ordered by time they were sent
+
+    :param path: JSON lines file written by TrafficRecorder
+    :return: list of dict
+    """
+    with open(path, encoding='utf-8') as trace:
+        entries = [DictWrapper(json.loads(line)) for line in trace
+                   if line.strip()]
+    return sorted(entries, key=lambda entry: entry.timestamp)
+
 
 def auth_require(func: callable) -> Any:
     """Simple wrapper to prevent unauthorized http requests to API server
@@ -88,12 +322,20 @@ class BotApiV1:
 
     """
 
-    def __init__(self, host):
+    def __init__(self, host, recorder: TrafficRecorder = None,
+                 limiter: AdaptiveLimiter = None, stats: RunStats = None,
+                 max_retries: int = MAX_RETRIES):
         self.__host = host
         self._session = requests.Session()
         self._session.verify = False  # ignore self signed certificates
         self._session.headers['Accept'] = 'application/json'
+        self._session.headers['Accept-Encoding'] = 'gzip, deflate'
         self._me = {}
+        self._recorder = recorder
+        self._client_id = uuid.uuid4().hex[:12]
+        self._limiter = limiter
+        self._max_retries = max_retries
+        self.stats = stats or RunStats()
 
     def _build_url(self, uri: AnyStr) -> AnyStr:
         """builds full url to api .
@@ -103,31 +345,151 @@ class BotApiV1:
         """
         return reduce_slashes(f'{self.__host}/{uri}/')
 
-    def __post(self, *args, **kwargs) -> requests.Response:
+    def __post(self, url: AnyStr, data: Any = None, compress: bool = False,
+               **kwargs) -> requests.Response:
         """Helper method to make a POST http request
 
-        :param args:
+        :param url: full url
+        :param data: request body
+        :param compress: send body as gzip compressed JSON
         :param kwargs:
         :return: requests.Response
         """
-        return self.__request(*args, **kwargs, method='POST')
+        if compress:
+            data = gzip.compress(json.dumps(data).encode())
+            kwargs['headers'] = {
+                'Content-Type': 'application/json',
+                'Content-Encoding': 'gzip',
+                **kwargs.get('headers', {})
+            }
+        return self.__request(url, data=data, **kwargs, method='POST')
+
+    def __idempotent_post(self, url: AnyStr,
+                          data: Any = None) -> requests.Response:
+        """POST request retried with the same Idempotency-Key
+
+        Server returns stored response for repeated key so retry does not
+        create the object twice.
+
+        :param url: full url
+        :param data: request body
+        :return: requests.Response
+        """
+        return self.__post(url, data,
+                           headers={'Idempotency-Key': uuid.uuid4().hex},
+                           retry=True)
 
-    def __request(self, *args, method='GET', **kwargs) -> requests.Response:
+    def __request(self, *args, method='GET', retry: bool = None,
+                  **kwargs) -> requests.Response:
         """Makes HTTP requests with HTTP status checks
 
+        Requests failed with connection error or one of RETRY_STATUSES are
+        retried with jittered exponential backoff if they are idempotent,
+        throttled requests are retried for any method.
+
         :param args:
         :param method:
+        :param retry: retry request even if method is not idempotent
+        :param kwargs:
+        :return: requests.Response
+        """
+        if retry is None:
+            retry = method in IDEMPOTENT_METHODS
+        for attempt in itertools.count(1):
+            retry_after = None
+            try:
+                resp = self.__send(method, *args, **kwargs)
+            except (requests.ConnectionError, requests.Timeout) as _:
+                if not retry or attempt > self._max_retries:
+                    self.stats.add('failed')
+                    raise
+            else:
+                if not 200 < resp.status_code > 304:
+                    return resp
+                if (attempt > self._max_retries
+                        or resp.status_code not in RETRY_STATUSES
+                        or not (retry or resp.status_code == 429)):
+                    self.stats.add('failed')
+                    raise ApiException(
+                        'Api request failed. {}'.format(resp.status_code),
+                        resp
+                    )
+                retry_after = resp.headers.get('Retry-After')
+            self.stats.add('retries')
+            time.sleep(backoff_delay(attempt, retry_after))
+
+    def __send(self, method: AnyStr, *args, **kwargs) -> requests.Response:
+        """Makes single HTTP request within concurrency limit
+
+        :param method: HTTP method
+        :param args:
         :param kwargs:
         :return: requests.Response
         """
         request_func = getattr(self._session, method.lower())
-        resp = request_func(*args, **kwargs)
-        if 200 < resp.status_code > 304:
-            raise ApiException(
-                'Api request failed. {}'.format(resp.status_code),
-                resp
+        self.stats.add('requests')
+        started = self._limiter.acquire() if self._limiter else None
+        overloaded = True
+        try:
+            if not self._recorder:
+                resp = request_func(*args, **kwargs)
+            else:
+                resp = self.__recorded(request_func, method, *args, **kwargs)
+            overloaded = resp.status_code == 429 or resp.status_code >= 500
+            return resp
+        finally:
+            if self._limiter:
+                self._limiter.release(started, overloaded)
+
+    def __recorded(self, request_func: callable, method: AnyStr,
+                   url: AnyStr, data: dict = None,
+                   **kwargs) -> requests.Response:
+        """Makes HTTP request and writes it to traffic recorder
+
+        :param request_func: session method
+        :param method: HTTP method
+        :param url: full url
+        :param data: request body
+        :param kwargs:
+        :return: requests.Response
+        """
+        body = data
+        if isinstance(data, bytes):
+            body = None  # compressed
+        elif isinstance(data, dict):
+            body = {key: '***' if key in RECORD_REDACTED_FIELDS else value
+                    for key, value in data.items()}
+        timestamp = time.time()
+        started = time.monotonic()
+        status = None
+        try:
+            resp = request_func(url, data=data, **kwargs)
+            status = resp.status_code
+            return resp
+        finally:
+            self._recorder.write(
+                client=self._client_id,
+                method=method,
+                uri=url[len(self.__host):].strip('/'),
+                params=kwargs.get('params'),
+                body=body,
+                timestamp=timestamp,
+                status=status,
+                latency=time.monotonic() - started
             )
-        return resp
+
+    def send(self, method: AnyStr, uri: AnyStr, data: dict = None,
+             params: dict = None) -> requests.Response:
+        """Makes raw HTTP request to api
+
+        :param method: HTTP method
+        :param uri: path relative to api url
+        :param data: request body
+        :param params: query string parameters
+        :return: requests.Response
+        """
+        return self.__request(self._build_url(uri), data=data, params=params,
+                              method=method)
 
     def authenticate_token(self, token) -> None:
         """
@@ -138,24 +500,37 @@ class BotApiV1:
         try:
             self.__post(self._build_url('auth/verify'), {'token': token})
         except ApiException as _:
-            del self._session.headers['Authorization']
+            self._session.headers.pop('Authorization', None)
             raise
         else:
             self._session.headers['Authorization'] = f'JWT {token}'
 
-    def authenticate(self, username: AnyStr, password: AnyStr) -> None:
+    def authenticate(self, username: AnyStr, password: AnyStr) -> AnyStr:
         """Authenticate user
 
         :param username:  username or email
         :param password: string ema
-        :return: None
+        :return: JWT token
         """
         auth_data = {
             'username': username,
             'password': password
         }
         resp = self.__post(self._build_url('auth'), data=auth_data)
-        self._session.headers['Authorization'] = f'JWT {resp.json()["token"]}'
+        token = resp.json()['token']
+        self._session.headers['Authorization'] = f'JWT {token}'
+        return token
+
+    def refresh_token(self, token: AnyStr) -> AnyStr:
+        """Get new token for not yet expired one
+
+        :param token: JWT token
+        :return: new JWT token
+        """
+        resp = self.__post(self._build_url('auth/refresh'), {'token': token})
+        token = resp.json()['token']
+        self._session.headers['Authorization'] = f'JWT {token}'
+        return token
 
     @property
     @auth_require
@@ -184,6 +559,43 @@ class BotApiV1:
         for post in self.__request(self._build_url('posts')).json():
             yield DictWrapper(post)
 
+    def post_changes(self, cursor: AnyStr = '0', limit: int = 100) -> dict:
+        """Get posts changed after cursor
+
+        :param cursor: cursor returned by previous call, 0 for all posts
+        :param limit: maximum amount of posts
+        :return: dict with cursor, more and results keys
+        """
+        return DictWrapper(self.__request(
+            self._build_url('posts/changes'),
+            params={'since': cursor, 'limit': limit}
+        ).json())
+
+    def sync_posts(self, mirror: dict, cursor: AnyStr = '0') -> AnyStr:
+        """Bring local copy of posts up to date
+
+        :param mirror: dict of posts by id updated in place
+        :param cursor: cursor returned by previous sync, 0 for all posts
+        :return: cursor for the next sync
+        """
+        while True:
+            changes = self.post_changes(cursor)
+            for post in changes.results:
+                mirror[post['id']] = DictWrapper(post)
+            cursor = changes.cursor
+            if not changes.more:
+                return cursor
+
+    def get_post(self, post_id: int) -> dict:
+        """Get single post
+
+        :param post_id:
+        :return: dict with post details
+        """
+        return DictWrapper(
+            self.__request(self._build_url(f'posts/{post_id}')).json()
+        )
+
     def register(self, username, password, email) -> dict:
         """Register new user with provided data
 
@@ -207,6 +619,21 @@ class BotApiV1:
         result['token'] = data['token']
         return DictWrapper({**result, **user_data})
 
+    @auth_require
+    def bulk_users(self, count: int, password: AnyStr = None) -> List:
+        """Create many users at once, requires admin user
+
+        :param count: amount of users
+        :param password: shared password, random if empty
+        :return: list of dict with user details and tokens
+        """
+        data = {'count': count}
+        if password:
+            data['password'] = password
+        users = self.__post(self._build_url('users/bulk'), data,
+                            compress=True).json()
+        return [DictWrapper(user) for user in users]
+
     @auth_require
     def delete_post(self, post_id):
         """
@@ -224,7 +651,7 @@ class BotApiV1:
         :param body: string
         :return: dict with new post details
         """
-        data = self.__post(
+        data = self.__idempotent_post(
             self._build_url('posts'),
             {
                 'title': title,
@@ -241,7 +668,9 @@ class BotApiV1:
         :param post_id:
         :return:
         """
-        return self.__post(self._build_url(f'posts/{post_id}/like')).json()
+        return self.__idempotent_post(
+            self._build_url(f'posts/{post_id}/like')
+        ).json()
 
     def dislike_post(self, post_id: int) -> dict:
         """Dislike post
@@ -249,7 +678,9 @@ class BotApiV1:
         :param post_id:
         :return:
         """
-        return self.__post(self._build_url(f'posts/{post_id}/dislike')).json()
+        return self.__idempotent_post(
+            self._build_url(f'posts/{post_id}/dislike')
+        ).json()
 
 
 def text_generator(size=8,
@@ -260,7 +691,46 @@ def text_generator(size=8,
     :param chars: symbols to use
     :return: str
     """
-    return ''.join(random.choice(chars) for _ in range(size))
+    return ''.join(random.choices(chars, k=size))
+
+
+def arrival_offsets(profile: AnyStr,
+                    rate: float,
+                    duration: float,
+                    rate_end: float = None) -> Iterator[float]:
+    """Generate send times for an arrival rate profile
+
+    constant sends `rate` requests per second, ramp changes the rate
+    linearly from `rate` to `rate_end` during `duration`.
+
+    :param profile: constant or ramp
+    :param rate: requests per second at the start
+    :param duration: seconds
+    :param rate_end: requests per second at the end of ramp
+    :return: offsets in seconds from the start
+    """
+    if profile == 'constant' or rate_end is None:
+        rate_end = rate
+    elif profile != 'ramp':
+        raise ValueError(f'Unknown arrival profile {profile}')
+    if rate <= 0 and rate_end <= 0:
+        return
+
+    slope = (rate_end - rate) / duration
+    count = 0
+    while True:
+        count += 1
+        # solve rate * t + slope * t ** 2 / 2 == count for t
+        if slope:
+            discriminant = rate ** 2 + 2 * slope * count
+            if discriminant < 0:
+                return
+            offset = (math.sqrt(discriminant) - rate) / slope
+        else:
+            offset = count / rate
+        if offset > duration:
+            return
+        yield offset
 
 
 def get_config_file(filename: AnyStr) -> AnyStr:
@@ -276,13 +746,14 @@ def get_config_file(filename: AnyStr) -> AnyStr:
         return conf_file
 
 
-def _add_user(url: AnyStr) -> dict:
+def _add_user(url: AnyStr, **client_options) -> dict:
     """Creates users in Api server
 
     :param url: url to Api server
+    :param client_options: keyword arguments for BotApiV1
     :return: dict with user details
     """
-    bot = BotApiV1(url)
+    bot = BotApiV1(url, **client_options)
     user = bot.register(
         username=text_generator(),
         password=text_generator(),
@@ -292,6 +763,66 @@ def _add_user(url: AnyStr) -> dict:
     return user, bot
 
 
+def _reuse_user(url: AnyStr, user: dict, **client_options) -> dict:
+    """Authenticate user stored in UserPool refreshing token if needed
+
+    Falls back to password login when the token is expired or rejected,
+    e.g. signed by a server which was set up again since.
+
+    :param url: url to Api server
+    :param user: dict with user details from UserPool
+    :param client_options: keyword arguments for BotApiV1
+    :return: dict with user details
+    """
+    bot = BotApiV1(url, **client_options)
+    expires_in = token_expiration(user.token) - time.time()
+    if expires_in > 0:
+        try:
+            if expires_in < TOKEN_REFRESH_MARGIN:
+                user['token'] = bot.refresh_token(user.token)
+            bot.authenticate_token(user.token)
+            return user, bot
+        except ApiException as _:
+            pass
+    user['token'] = bot.authenticate(user.username, user.password1)
+    return user, bot
+
+
+def _acquire_users(url: AnyStr,
+                   amount: int,
+                   executor: concurrent.futures.Executor,
+                   pool: UserPool = None,
+                   **client_options) -> List:
+    """Get authenticated users reusing pooled ones and registering the rest
+
+    :param url: url to Api server
+    :param amount: number of users
+    :param executor: executor to run requests in
+    :param pool: optional pool of previously registered users
+    :param client_options: keyword arguments for BotApiV1
+    :return: list of (user details, BotApiV1) pairs
+    """
+    stats = client_options.get('stats')
+    users, rejected = [], []
+    if pool:
+        features = {
+            executor.submit(_reuse_user, url, user, **client_options): user
+            for user in pool.users(url)[:amount]
+        }
+        users = _get_feature_results(list(features), stats)
+        # server answered that login failed, other errors may be temporary
+        rejected = [user.username for future, user in features.items()
+                    if isinstance(future.exception(), ApiException) and
+                    future.exception().status_code in LOGIN_REJECTED_STATUSES]
+    users += _get_feature_results([
+        executor.submit(_add_user, url, **client_options)
+        for _ in range(amount - len(users))
+    ], stats)
+    if pool:
+        pool.save(url, [user for user, _ in users], rejected)
+    return users
+
+
 def _add_posts(user: dict, client: BotApiV1) -> dict:
     """Generate some random articles for user
 
@@ -304,53 +835,314 @@ def _add_posts(user: dict, client: BotApiV1) -> dict:
                            text_generator(1024, string.printable))
 
 
-def _like_posts(user: dict, client: BotApiV1, amount) -> dict:
+def _like_post(user: dict, client: BotApiV1, post: dict) -> dict:
     """Adds Like or dislike for a post
 
     :param user:  dict user details
     :param client: BotApiV1 object
+    :param post: post to vote for
     :return: dict
     """
-    posts = list(client.posts())
-    result = []
-    for _ in range(1, amount):
-        post = random.choice(posts)
-        try:
-            res = getattr(
-                client,
-                random.choice(['like_post', 'dislike_post'])
-            )(post.id)
-        except ApiException as excp:
-            print(excp)
-        else:
-            res['post'] = post
-            result.append(DictWrapper(res))
-
-    return result
+    res = getattr(
+        client,
+        random.choice(['like_post', 'dislike_post'])
+    )(post.id)
+    res['post'] = post
+    return DictWrapper(res)
 
 
-def _get_feature_results(features: List) -> dict:
+def _get_feature_results(features: List, stats: RunStats = None) -> dict:
     result = []
     for future in concurrent.futures.as_completed(features):
         try:
             data = future.result()
         except Exception as exc:
+            if stats:
+                stats.add('dropped')
             print(f' generated an exception: {exc}')
         else:
             result.append(data)
     return result
 
 
+def _open_loop_worker(url: AnyStr,
+                      tokens: List,
+                      profile: AnyStr,
+                      rate: float,
+                      duration: float,
+                      rate_end: float,
+                      phase: float,
+                      max_in_flight: int,
+                      record: AnyStr = None) -> dict:
+    """Sends requests on schedule without waiting for responses
+
+    Runs in a separate process, latency is measured from the scheduled
+    send time so a slow server can not hide its queueing delay.
+
+    :param url: url to Api server
+    :param tokens: JWT tokens of users to send requests as
+    :param profile: arrival profile see arrival_offsets
+    :param rate: requests per second for this worker
+    :param duration: seconds
+    :param rate_end: requests per second at the end of ramp
+    :param phase: seconds to shift schedule to interleave with other workers
+    :param max_in_flight: maximum amount of concurrent requests
+    :param record: optional JSON lines file to record requests to
+    :return: dict with raw results
+    """
+    recorder = TrafficRecorder(record) if record else None
+    clients = []
+    for token in tokens:
+        client = BotApiV1(url, recorder, max_retries=0)
+        client.authenticate_token(token)
+        clients.append(client)
+    posts = [post.id for post in clients[0].posts()]
+    operations, weights = zip(*OPEN_LOOP_MIX)
+    # server allows one vote per user and post, votes take unused pairs
+    # so they are not rejected as repeated
+    vote_pairs = list(itertools.product(clients, posts))
+    random.shuffle(vote_pairs)
+
+    result = {'sent': 0, 'late': 0, 'errors': {}, 'latencies': [],
+              'votes_replaced': 0}
+    lock = threading.Lock()
+
+    def __send(scheduled: float, operation: AnyStr):
+        if time.monotonic() - scheduled > 0.01:
+            with lock:
+                result['late'] += 1
+        client, post_id = random.choice(clients), random.choice(posts)
+        if operation in ('like_post', 'dislike_post'):
+            with lock:
+                if vote_pairs:
+                    client, post_id = vote_pairs.pop()
+                else:
+                    operation = 'get_post'
+                    result['votes_replaced'] += 1
+        error = None
+        try:
+            getattr(client, operation)(post_id)
+        except ApiException as excp:
+            error = str(excp.status_code)
+        except requests.RequestException as excp:
+            error = type(excp).__name__
+        latency = time.monotonic() - scheduled
+        with lock:
+            result['latencies'].append(latency)
+            if error:
+                result['errors'][error] = result['errors'].get(error, 0) + 1
+
+    if not posts:
+        return result
+
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_in_flight) as executor:
+        start = time.monotonic() + phase
+        for offset in arrival_offsets(profile, rate, duration, rate_end):
+            scheduled = start + offset
+            delay = scheduled - time.monotonic()
+            if delay > 0:
+                time.sleep(delay)
+            operation = random.choices(operations, weights)[0]
+            executor.submit(__send, scheduled, operation)
+            result['sent'] += 1
+    return result
+
+
+def _print_load_summary(results: List, duration: float) -> None:
+    """Aggregate results from load workers and print them
+
+    :param results: list of dicts returned by _open_loop_worker
+    :param duration: seconds
+    :return: None
+    """
+    latencies = sorted(
+        latency for result in results for latency in result['latencies']
+    )
+    errors = {}
+    for result in results:
+        for error, amount in result['errors'].items():
+            errors[error] = errors.get(error, 0) + amount
+    sent = sum(result['sent'] for result in results)
+    late = sum(result['late'] for result in results)
+    votes_replaced = sum(result.get('votes_replaced', 0)
+                         for result in results)
+
+    print(f'Sent {sent} requests in {duration:.1f}s '
+          f'({sent / duration:.1f} req/s), {late} sent late')
+    if latencies:
+        def __percentile(value):
+            index = min(len(latencies) - 1, int(len(latencies) * value))
+            return latencies[index] * 1000
+
+        print(f'Latency ms p50={__percentile(0.5):.1f} '
+              f'p90={__percentile(0.9):.1f} '
+              f'p99={__percentile(0.99):.1f} '
+              f'max={latencies[-1] * 1000:.1f}')
+    for error, amount in sorted(errors.items()):
+        print(f'Error {error}: {amount}')
+    if votes_replaced:
+        print(f'Votes sent as reads, no unused user and post left: '
+              f'{votes_replaced}')
+
+
+def _print_run_summary(stats: RunStats, limiter: AdaptiveLimiter) -> None:
+    """Print retries and lost operations of closed loop run
+
+    :param stats: counters shared by run clients
+    :param limiter: concurrency limiter shared by run clients
+    :return: None
+    """
+    print(f'Requests {stats["requests"]}, retries {stats["retries"]}, '
+          f'failed {stats["failed"]}, dropped operations {stats["dropped"]}')
+    print(f'Concurrency limit {limiter.limit:.1f} '
+          f'(min {limiter.lowest:.1f}, max {limiter.highest:.1f}, '
+          f'decreased {limiter.decreases} times)')
+
+
+def run_open_loop(url: AnyStr,
+                  tokens: List,
+                  processes: int = 1,
+                  profile: AnyStr = 'constant',
+                  rate: float = 10,
+                  duration: float = 60,
+                  rate_end: float = None,
+                  max_in_flight: int = 100,
+                  record: AnyStr = None) -> None:
+    """Generate load at target arrival rate from several processes
+
+    :param url: url to Api server
+    :param tokens: JWT tokens of existing users
+    :param processes: amount of worker processes
+    :param profile: constant or ramp
+    :param rate: total requests per second
+    :param duration: seconds
+    :param rate_end: total requests per second at the end of ramp
+    :param max_in_flight: maximum concurrent requests per process
+    :param record: optional JSON lines file to record requests to
+    :return: None
+    """
+    processes = max(1, processes)
+    worker_rate = rate / processes
+    worker_rate_end = rate_end / processes if rate_end is not None else None
+    with concurrent.futures.ProcessPoolExecutor(
+            max_workers=processes) as executor:
+        features = [
+            executor.submit(
+                _open_loop_worker, url,
+                tokens[indx::processes] or tokens,
+                profile, worker_rate, duration, worker_rate_end,
+                indx / (processes * max(rate, 1)), max_in_flight, record
+            )
+            for indx in range(processes)
+        ]
+        results = _get_feature_results(features)
+    _print_load_summary(results, duration)
+
+
+def replay_traffic(url: AnyStr,
+                   trace: AnyStr,
+                   speed: float = 1,
+                   max_in_flight: int = 100,
+                   pool: AnyStr = None) -> None:
+    """Re-issue recorded requests against api server
+
+    Every recorded client is replaced with a pooled or newly registered
+    user, authentication requests are skipped because they are already
+    done for these users.
+
+    :param url: url to Api server
+    :param trace: JSON lines file written by TrafficRecorder
+    :param speed: time scale, 2 replays twice faster, 0 sends as fast as
+        possible
+    :param max_in_flight: maximum concurrent requests
+    :param pool: optional JSON file with users from previous runs
+    :return: None
+    """
+    entries = [entry for entry in read_traffic(trace)
+               if not entry.uri.startswith('auth')]
+    if not entries:
+        print('Nothing to replay')
+        return
+
+    client_ids = sorted({entry.client for entry in entries})
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=min(len(client_ids), max_in_flight)) as executor:
+        users = _acquire_users(url, len(client_ids), executor,
+                               UserPool(pool) if pool else None,
+                               max_retries=0)
+    if len(users) != len(client_ids):
+        print('Could not create users for all recorded clients')
+        return
+    clients = {client_id: client
+               for client_id, (_, client) in zip(client_ids, users)}
+
+    result = {'sent': 0, 'late': 0, 'errors': {}, 'latencies': [],
+              'mismatched': 0}
+    lock = threading.Lock()
+
+    def __send(scheduled: float, entry: dict):
+        if speed and time.monotonic() - scheduled > 0.01:
+            with lock:
+                result['late'] += 1
+        status, error = None, None
+        try:
+            status = clients[entry.client].send(
+                entry.method, entry.uri, entry.body, entry.get('params')
+            ).status_code
+        except ApiException as excp:
+            status = excp.status_code
+            error = str(status)
+        except requests.RequestException as excp:
+            error = type(excp).__name__
+        latency = time.monotonic() - scheduled
+        with lock:
+            result['latencies'].append(latency)
+            if error:
+                result['errors'][error] = result['errors'].get(error, 0) + 1
+            if status != entry.status:
+                result['mismatched'] += 1
+
+    first = entries[0].timestamp
+    start = time.monotonic()
+    with concurrent.futures.ThreadPoolExecutor(
+            max_workers=max_in_flight) as executor:
+        for entry in entries:
+            scheduled = time.monotonic()
+            if speed:
+                scheduled = start + (entry.timestamp - first) / speed
+                delay = scheduled - time.monotonic()
+                if delay > 0:
+                    time.sleep(delay)
+            executor.submit(__send, scheduled, entry)
+            result['sent'] += 1
+    _print_load_summary([result], time.monotonic() - start)
+    print(f'Responses with status different from recorded: '
+          f'{result["mismatched"]}')
+
+
 def run_bot(url: AnyStr,
             number_of_users: int,
             max_posts_per_user: int,
-            max_likes_per_user: int) -> None:
+            max_likes_per_user: int,
+            open_loop: dict = None,
+            record: AnyStr = None,
+            pool: AnyStr = None,
+            concurrency: dict = None,
+            max_retries: int = MAX_RETRIES) -> None:
     """
 
     :param url: AnyStr url of api server
     :param number_of_users: number of users to create
     :param max_posts_per_user: maximum amount of posts that need to create
     :param max_likes_per_user: maximum amount of likes per user
+    :param open_loop: keyword arguments for run_open_loop, replaces closed
+        loop likes when provided
+    :param record: optional JSON lines file to record requests to
+    :param pool: optional JSON file to reuse and store bot users in
+    :param concurrency: keyword arguments for AdaptiveLimiter shared by
+        all users, maximum defaults to number_of_users
+    :param max_retries: retries of failed requests per call
     :return:
     """
     print(url, number_of_users, max_posts_per_user, max_likes_per_user)
@@ -358,35 +1150,76 @@ def run_bot(url: AnyStr,
         print('Amount of users not specified exiting')
         return
 
+    stats = RunStats()
+    limiter = AdaptiveLimiter(**{'maximum': number_of_users,
+                                 **(concurrency or {})})
+    client_options = {
+        'recorder': TrafficRecorder(record) if record else None,
+        'limiter': limiter,
+        'stats': stats,
+        'max_retries': max_retries,
+    }
+    try:
+        _run_closed_loop(url, number_of_users, max_posts_per_user,
+                         max_likes_per_user, open_loop, record, pool,
+                         client_options)
+    finally:
+        _print_run_summary(stats, limiter)
+
+
+def _run_closed_loop(url: AnyStr,
+                     number_of_users: int,
+                     max_posts_per_user: int,
+                     max_likes_per_user: int,
+                     open_loop: dict,
+                     record: AnyStr,
+                     pool: AnyStr,
+                     client_options: dict) -> None:
+    """Create users, posts and likes waiting for every response
+
+    :param client_options: keyword arguments for BotApiV1
+    :return: None, see run_bot for the rest of arguments
+    """
+    stats = client_options['stats']
+    # every request is a separate task so requests in flight are limited
+    # only by the shared AdaptiveLimiter
     with concurrent.futures.ThreadPoolExecutor(
-            max_workers=number_of_users) as executor:
-
-        def __run(*args, amount=0):
-            return _get_feature_results(
-                [executor.submit(*args) for _ in range(0, amount)]
-            )
-        users = __run(_add_user, url, amount=number_of_users)
+            max_workers=int(client_options['limiter'].maximum)) as executor:
+        users = _acquire_users(url, number_of_users, executor,
+                               UserPool(pool) if pool else None,
+                               **client_options)
         if not users:
             print('Something happened no users were created')
             return
 
         if max_posts_per_user > 0:
-            for user in users:
-                user_data, client = user
-                amount = random.randint(1, max_posts_per_user)
-                posts = __run(_add_posts, *user, amount=amount)
-                for indx, post in enumerate(posts, start=1):
-                    print(f'Created post #{indx} {post.title} '
-                          f'for user {user_data.username}')
-
-        if max_likes_per_user > 0:
-            for user in users:
-                likes = __run(_like_posts, *user, max_likes_per_user, amount=1)
-                for indx, like in enumerate(likes[-1], start=1):
-                    action = 'Liked'
-                    if like.vote < 0:
-                        action = 'Disliked'
-                    print(f'{action} post #{indx} {like.post.title} ')
+            posts = _get_feature_results([
+                executor.submit(_add_posts, *user)
+                for user in users
+                for _ in range(random.randint(1, max_posts_per_user))
+            ], stats)
+            for indx, post in enumerate(posts, start=1):
+                print(f'Created post #{indx} {post.title} '
+                      f'for user #{post.author}')
+
+        if open_loop is not None:
+            run_open_loop(url, [user.token for user, _ in users],
+                          record=record, **open_loop)
+        elif max_likes_per_user > 0:
+            posts = list(users[0][1].posts())
+            # a user can vote for a post only once
+            likes = _get_feature_results([
+                executor.submit(_like_post, *user, post)
+                for user in users
+                for post in random.sample(
+                    posts, min(len(posts), max_likes_per_user)
+                )
+            ], stats)
+            for indx, like in enumerate(likes, start=1):
+                action = 'Liked'
+                if like.vote < 0:
+                    action = 'Disliked'
+                print(f'{action} post #{indx} {like.post.title} ')
 
 
 if __name__ == '__main__':
@@ -396,6 +1229,30 @@ if __name__ == '__main__':
 
     CONFIG_PARSER = ConfigParser(allow_no_value=True)
     CONFIG_PARSER.read(CONFIG)
+    MODE = CONFIG_PARSER.get('general', 'mode', fallback='closed')
+    if MODE == 'replay':
+        replay_traffic(
+            url=CONFIG_PARSER.get('general', 'api_url'),
+            trace=CONFIG_PARSER.get('replay', 'trace_file'),
+            speed=CONFIG_PARSER.getfloat('replay', 'speed'),
+            max_in_flight=CONFIG_PARSER.getint('replay', 'max_in_flight'),
+            pool=CONFIG_PARSER.get('general', 'user_pool_file',
+                                   fallback=None),
+        )
+        raise SystemExit()
+
+    OPEN_LOOP = None
+    if MODE == 'open':
+        OPEN_LOOP = {
+            'processes': CONFIG_PARSER.getint('open_loop', 'processes'),
+            'profile': CONFIG_PARSER.get('open_loop', 'profile'),
+            'rate': CONFIG_PARSER.getfloat('open_loop', 'rate'),
+            'rate_end': CONFIG_PARSER.getfloat('open_loop', 'rate_end',
+                                               fallback=None),
+            'duration': CONFIG_PARSER.getfloat('open_loop', 'duration'),
+            'max_in_flight': CONFIG_PARSER.getint('open_loop',
+                                                  'max_in_flight'),
+        }
     run_bot(
         url=CONFIG_PARSER.get('general', 'api_url'),
         number_of_users=CONFIG_PARSER.getint('general', 'number_of_users'),
@@ -403,6 +1260,18 @@ if __name__ == '__main__':
                                                 'max_posts_per_user'),
         max_likes_per_user=CONFIG_PARSER.getint('general',
                                                 'max_likes_per_user'),
+        open_loop=OPEN_LOOP,
+        record=CONFIG_PARSER.get('general', 'record_file', fallback=None),
+        pool=CONFIG_PARSER.get('general', 'user_pool_file', fallback=None),
+        concurrency={
+            'initial': CONFIG_PARSER.getfloat('concurrency', 'initial',
+                                              fallback=4),
+            'target_latency': CONFIG_PARSER.getfloat(
+                'concurrency', 'target_latency', fallback=0.5
+            ),
+        },
+        max_retries=CONFIG_PARSER.getint('concurrency', 'max_retries',
+                                         fallback=MAX_RETRIES),
     )
 
 
@@ -50,6 +50,7 @@ SITE_ID = 1
 
 MIDDLEWARE = [
     'django.middleware.security.SecurityMiddleware',
+    'api.middleware.CompressionMiddleware',
     'django.contrib.sessions.middleware.SessionMiddleware',
     'django.middleware.common.CommonMiddleware',
     'django.middleware.csrf.CsrfViewMiddleware',
@@ -136,8 +137,60 @@ REST_FRAMEWORK = {
     'DEFAULT_AUTHENTICATION_CLASSES': (
         'rest_framework_jwt.authentication.JSONWebTokenAuthentication',
     ),
+    'DEFAULT_RENDERER_CLASSES': (
+        'api.renderers.FastJSONRenderer',
+        'rest_framework.renderers.BrowsableAPIRenderer',
+    ),
+    'DEFAULT_PARSER_CLASSES': (
+        'api.parsers.FastJSONParser',
+        'rest_framework.parsers.FormParser',
+        'rest_framework.parsers.MultiPartParser',
+    ),
+}
+
+# Token bucket throttling of write endpoints, per scope every bucket is
+# (rate, burst size). 'user' is a bucket per client, 'global' is shared
+# by all clients of a server process.
+TOKEN_BUCKET_THROTTLE = {
+    'posts': {
+        'user': ('2/s', 10),
+        'global': ('50/s', 100),
+    },
+    'votes': {
+        'user': ('10/s', 20),
+        'global': ('500/s', 1000),
+    },
+}
+
+# Votes older than this amount of days are moved to the archive table by
+# archive_votes management command
+VOTE_ARCHIVE_AFTER_DAYS = 90
+
+# Counter stream sends at most one event per this amount of seconds and a
+# keep-alive comment when nothing changed for heartbeat seconds
+COUNTER_STREAM_INTERVAL = 0.5
+COUNTER_STREAM_HEARTBEAT = 15
+COUNTER_STREAM_MAX_POSTS = 100
+
+# Responses of requests with Idempotency-Key header are kept in the
+# 'idempotency' cache for TIMEOUT seconds, it has to be shared by all server
+# processes (memcached, redis) when there is more than one
+CACHES = {
+    'default': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+    },
+    'idempotency': {
+        'BACKEND': 'django.core.cache.backends.locmem.LocMemCache',
+        'LOCATION': 'idempotency',
+        'TIMEOUT': 24 * 60 * 60,
+        'OPTIONS': {'MAX_ENTRIES': 100000},
+    },
 }
 
+# Responses smaller than this amount of bytes are not compressed
+COMPRESSION_MIN_SIZE = 1024
+COMPRESSION_LEVEL = 6
+
 REST_USE_JWT = True
 
 # Configure the JWTs to expire after 1 hour, and allow users to refresh
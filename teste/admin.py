@@ -1,10 +1,16 @@
 from django.contrib import admin
 
-from .models import Post
+from .models import AuthorStats, Post
 
 
 class PostAdmin(admin.ModelAdmin):
-    list_display = ('title', 'likes', 'dislikes')
+    list_display = ('title', 'likes', 'dislikes', 'counter_shards')
+
+
+class AuthorStatsAdmin(admin.ModelAdmin):
+    list_display = ('user', 'posts_count', 'likes_received',
+                    'dislikes_received', 'votes_cast')
 
 
 admin.site.register(Post, PostAdmin)
+admin.site.register(AuthorStats, AuthorStatsAdmin)
@@ -0,0 +1,44 @@
+# -*- coding: UTF-8 -*-
+"""
+Moving old votes from the votes table into the archive table.
+"""
+from django.db import transaction
+
+from .models import ArchivedVote, Vote
+
+ARCHIVED_FIELDS = ('id', 'vote', 'author_id', 'content_type_id', 'object_id',
+                   'created_at')
+
+
+def votes_to_archive(older_than, batch_size=1000):
+    """Next batch of votes created before given time
+
+    :return: values queryset with ARCHIVED_FIELDS
+    """
+    return Vote.objects.filter(created_at__lt=older_than).order_by(
+        'created_at'
+    ).values(*ARCHIVED_FIELDS)[:batch_size]
+
+
+def archive_votes(older_than, batch_size=1000):
+    """Move votes created before given time into ArchivedVote
+
+    Votes are taken in batches ordered by the created_at index and removed
+    with a queryset delete, so counters of voted objects and author stats
+    stay as they are.
+
+    :param older_than: datetime
+    :param batch_size: amount of votes moved per transaction
+    :return: amount of archived votes
+    """
+    archived = 0
+    while True:
+        with transaction.atomic():
+            batch = list(votes_to_archive(older_than, batch_size))
+            if not batch:
+                return archived
+            ArchivedVote.objects.bulk_create(
+                ArchivedVote(**row) for row in batch
+            )
+            Vote.objects.filter(pk__in=[row['id'] for row in batch]).delete()
+        archived += len(batch)
@@ -0,0 +1,174 @@
+# -*- coding: UTF-8 -*-
+"""
+Microbenchmarks of model and serializer hot paths.
+"""
+import statistics
+import time
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import connection
+from django.http import HttpResponse
+from django.test import RequestFactory
+from django.test.utils import CaptureQueriesContext
+from rest_framework.renderers import JSONRenderer
+
+from api.middleware import CompressionMiddleware
+from api.permissions import IsOwner
+from api.renderers import FastJSONRenderer
+from api.serializers import PostSerializer
+
+from .models import Post, Vote
+from .provisioning import insert_users
+
+BENCHMARKS = {}
+
+
+def benchmark(func):
+    """Register benchmark
+
+    Benchmark function receives amount of iterations and returns callable
+    doing a single iteration, everything before is not timed.
+    """
+    BENCHMARKS[func.__name__] = func
+    return func
+
+
+@benchmark
+def vote_save(iterations, counter_shards=0):
+    post = Post.objects.order_by('-likes').first()
+    Post.objects.filter(pk=post.pk).update(counter_shards=counter_shards)
+    content_type = ContentType.objects.get_for_model(Post)
+    users = iter(insert_users(
+        [f'benchmark_{time.monotonic_ns()}_{indx}'
+         for indx in range(iterations)],
+        ['!'] * iterations
+    ))
+
+    def __run():
+        Vote(vote=1, author=next(users), content_type=content_type,
+             object_id=post.pk).save()
+    return __run
+
+
+@benchmark
+def vote_save_sharded(iterations, counter_shards=8):
+    return vote_save(iterations, counter_shards)
+
+
+@benchmark
+def post_unique_slug(iterations):
+    post = Post(title=Post.objects.order_by('?').first().title)
+    return post._get_unique_slug
+
+
+@benchmark
+def post_list_render(iterations, list_size=100, renderer=JSONRenderer):
+    renderer = renderer()
+
+    def __run():
+        posts = Post.objects.with_counters().order_by('-created_on')[
+            :list_size
+        ]
+        renderer.render(PostSerializer(posts, many=True).data)
+    return __run
+
+
+@benchmark
+def post_list_render_fast(iterations, list_size=100):
+    return post_list_render(iterations, list_size, FastJSONRenderer)
+
+
+@benchmark
+def large_list_json(iterations, list_size=1000, renderer=JSONRenderer):
+    renderer = renderer()
+    posts = Post.objects.order_by('-created_on')[:list_size]
+    data = PostSerializer(posts, many=True).data
+
+    def __run():
+        renderer.render(data)
+    return __run
+
+
+@benchmark
+def large_list_json_fast(iterations, list_size=1000):
+    return large_list_json(iterations, list_size, FastJSONRenderer)
+
+
+@benchmark
+def large_list_gzip(iterations, list_size=1000):
+    posts = Post.objects.order_by('-created_on')[:list_size]
+    request = RequestFactory().get('/', HTTP_ACCEPT_ENCODING='gzip')
+    content = FastJSONRenderer().render(PostSerializer(posts, many=True).data)
+    middleware = CompressionMiddleware(None)
+
+    def __run():
+        middleware.compress_response(request, HttpResponse(content))
+    return __run
+
+
+@benchmark
+def is_owner_check(iterations):
+    request = RequestFactory().post('/')
+    request.user = Post.objects.first().author
+    # fresh instances so every check loads the author like a view does
+    posts = iter(Post.objects.all()[:iterations])
+    permission = IsOwner()
+
+    def __run():
+        permission.has_object_permission(request, None, next(posts))
+    return __run
+
+
+def run_benchmark(name, iterations, repeat):
+    """Time benchmark and count its queries
+
+    :param name: registered benchmark name
+    :param iterations: iterations per timed run
+    :param repeat: amount of timed runs, the best one is reported
+    :return: dict with seconds and queries per iteration
+    """
+    func = BENCHMARKS[name]
+    with CaptureQueriesContext(connection) as queries:
+        operation = func(1)
+        start = len(queries)
+        operation()
+        query_count = len(queries) - start
+
+    timings = []
+    for _ in range(repeat):
+        operation = func(iterations)
+        started = time.perf_counter()
+        for _ in range(iterations):
+            operation()
+        timings.append((time.perf_counter() - started) / iterations)
+    return {
+        'seconds': min(timings),
+        'median': statistics.median(timings),
+        'queries': query_count,
+    }
+
+
+def compare(results, baseline, threshold):
+    """Find benchmarks slower than baseline
+
+    :param results: dict returned by run_benchmark per benchmark name
+    :param baseline: previously stored results
+    :param threshold: allowed relative slowdown, 0.2 is 20%
+    :return: list of regression descriptions
+    """
+    regressions = []
+    for name, result in results.items():
+        if name not in baseline:
+            continue
+        expected = baseline[name]
+        if result['seconds'] > expected['seconds'] * (1 + threshold):
+            regressions.append(
+                f'{name}: {result["seconds"] * 1e6:.1f}us per iteration, '
+                f'baseline {expected["seconds"] * 1e6:.1f}us'
+            )
+        if result['queries'] > expected['queries']:
+            regressions.append(
+                f'{name}: {result["queries"]} queries per iteration, '
+                f'baseline {expected["queries"]}'
+            )
+    return regressions
@@ -0,0 +1,70 @@
+# -*- coding: UTF-8 -*-
+"""
+In-process publish/subscribe of counter changes.
+"""
+import threading
+from collections import defaultdict
+
+
+class Subscription:
+    """Keys a subscriber listens to and keys changed since last wait"""
+
+    def __init__(self, keys):
+        self.keys = frozenset(keys)
+        self._changed = set()
+        self._condition = threading.Condition()
+
+    def notify(self, key):
+        with self._condition:
+            self._changed.add(key)
+            self._condition.notify()
+
+    def wait(self, timeout):
+        """Wait for changes and return them
+
+        :param timeout: seconds to wait when nothing changed yet
+        :return: set of changed keys, empty on timeout
+        """
+        with self._condition:
+            if not self._changed:
+                self._condition.wait(timeout)
+            changed, self._changed = self._changed, set()
+        return changed
+
+
+class Broker:
+    """Delivers published keys to subscriptions listening to them
+
+    Only subscribers of the current process are notified.
+    """
+
+    def __init__(self):
+        self._subscriptions = defaultdict(set)
+        self._lock = threading.Lock()
+
+    def subscribe(self, keys):
+        subscription = Subscription(keys)
+        with self._lock:
+            for key in subscription.keys:
+                self._subscriptions[key].add(subscription)
+        return subscription
+
+    def unsubscribe(self, subscription):
+        with self._lock:
+            for key in subscription.keys:
+                subscribers = self._subscriptions.get(key)
+                if subscribers is None:
+                    continue
+                subscribers.discard(subscription)
+                if not subscribers:
+                    del self._subscriptions[key]
+
+    def publish(self, key):
+        with self._lock:
+            subscribers = list(self._subscriptions.get(key, ()))
+        for subscription in subscribers:
+            subscription.notify(key)
+
+
+# (content type id, object id) of objects whose vote counters changed
+counters = Broker()
@@ -0,0 +1,28 @@
+# -*- coding: UTF-8 -*-
+"""
+"""
+import datetime
+
+from django.conf import settings
+from django.core.management.base import BaseCommand
+from django.utils import timezone
+
+from teste.archiving import archive_votes
+
+
+class Command(BaseCommand):
+    help = 'Move old votes into the archive table'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--days', type=int,
+                            default=settings.VOTE_ARCHIVE_AFTER_DAYS,
+                            help='archive votes older than this amount of '
+                                 'days')
+        parser.add_argument('--batch-size', type=int, default=1000)
+
+    def handle(self, *args, **options):
+        older_than = timezone.now() - datetime.timedelta(days=options['days'])
+        archived = archive_votes(older_than, options['batch_size'])
+        self.stdout.write(self.style.SUCCESS(
+            f'Archived {archived} votes created before {older_than}'
+        ))
@@ -0,0 +1,73 @@
+# -*- coding: UTF-8 -*-
+"""
+"""
+import json
+import os
+
+from django.core.management.base import BaseCommand, CommandError
+
+from teste.benchmarks import BENCHMARKS, compare, run_benchmark
+from teste.synthetic import generate_dataset
+from teste.utils import isolated_database
+
+
+class Command(BaseCommand):
+    help = ('Time model and serializer hot paths on synthetic dataset in '
+            'test database and compare them with stored baseline')
+
+    def add_arguments(self, parser):
+        parser.add_argument('benchmarks', nargs='*',
+                            help=f'any of {", ".join(BENCHMARKS)}')
+        parser.add_argument('--users', type=int, default=200)
+        parser.add_argument('--posts', type=int, default=2000)
+        parser.add_argument('--votes', type=int, default=20000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--iterations', type=int, default=100)
+        parser.add_argument('--repeat', type=int, default=5)
+        parser.add_argument('--baseline', default='benchmark_baseline.json')
+        parser.add_argument('--threshold', type=float, default=0.2,
+                            help='allowed slowdown, 0.2 is 20%%')
+        parser.add_argument('--save-baseline', action='store_true')
+
+    def handle(self, *args, **options):
+        names = options['benchmarks'] or list(BENCHMARKS)
+        unknown = set(names) - set(BENCHMARKS)
+        if unknown:
+            raise CommandError(f'Unknown benchmarks {", ".join(unknown)}')
+
+        results = {}
+        with isolated_database():
+            generate_dataset(options['users'], options['posts'],
+                             options['votes'], seed=options['seed'])
+            for name in names:
+                results[name] = run_benchmark(name, options['iterations'],
+                                              options['repeat'])
+                self.stdout.write(
+                    '{name:<20} {seconds_us:>10.1f}us '
+                    '(median {median_us:.1f}us) {queries} queries'.format(
+                        name=name,
+                        seconds_us=results[name]['seconds'] * 1e6,
+                        median_us=results[name]['median'] * 1e6,
+                        queries=results[name]['queries'],
+                    )
+                )
+
+        baseline = {}
+        if os.path.isfile(options['baseline']):
+            with open(options['baseline'], encoding='utf-8') as stored:
+                baseline = json.load(stored)
+
+        if options['save_baseline']:
+            baseline.update(results)
+            with open(options['baseline'], 'w', encoding='utf-8') as stored:
+                json.dump(baseline, stored, indent=1)
+            self.stdout.write(self.style.SUCCESS(
+                f'Baseline written to {options["baseline"]}'
+            ))
+            return
+
+        regressions = compare(results, baseline, options['threshold'])
+        if regressions:
+            raise CommandError('Regressions found:\n' + '\n'.join(regressions))
+        if baseline:
+            self.stdout.write(self.style.SUCCESS('No regressions'))
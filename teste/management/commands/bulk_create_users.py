@@ -0,0 +1,48 @@
+# -*- coding: UTF-8 -*-
+"""
+"""
+import json
+import os
+
+from django.core.management.base import BaseCommand
+
+from teste.provisioning import bulk_create_users
+
+
+class Command(BaseCommand):
+    help = 'Create many users at once and write them to bot user pool file'
+
+    def add_arguments(self, parser):
+        parser.add_argument('count', type=int)
+        parser.add_argument('--password',
+                            help='shared password, random per user if empty')
+        parser.add_argument('--prefix', default='bot')
+        parser.add_argument('--batch-size', type=int, default=500)
+        parser.add_argument('--processes', type=int,
+                            help='processes used to hash random passwords')
+        parser.add_argument('--api-url',
+                            default='http://127.0.0.1:8000/api/v1',
+                            help='api url the users are stored for in pool')
+        parser.add_argument('--output', default='bot_users.json',
+                            help='bot user pool file')
+
+    def handle(self, *args, **options):
+        users = bulk_create_users(
+            options['count'],
+            password=options['password'],
+            prefix=options['prefix'],
+            batch_size=options['batch_size'],
+            processes=options['processes'],
+        )
+
+        pool = {}
+        if os.path.isfile(options['output']):
+            with open(options['output'], encoding='utf-8') as pool_file:
+                pool = json.load(pool_file)
+        pool.setdefault(options['api_url'], []).extend(users)
+        with open(options['output'], 'w', encoding='utf-8') as pool_file:
+            json.dump(pool, pool_file, indent=1)
+
+        self.stdout.write(self.style.SUCCESS(
+            f'Created {len(users)} users, written to {options["output"]}'
+        ))
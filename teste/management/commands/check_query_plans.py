@@ -0,0 +1,60 @@
+# -*- coding: UTF-8 -*-
+"""
+"""
+import json
+
+from django.core.management.base import BaseCommand, CommandError
+
+from teste.query_plans import EXPECTED_PLANS, QUERIES, compare, \
+    load_expected, query_plan
+from teste.synthetic import generate_dataset
+from teste.utils import isolated_database
+
+
+class Command(BaseCommand):
+    help = ('Compare EXPLAIN QUERY PLAN of api queries on synthetic dataset '
+            'in test database with stored plans and fail on new full '
+            'table scans')
+
+    def add_arguments(self, parser):
+        parser.add_argument('queries', nargs='*',
+                            help=f'any of {", ".join(QUERIES)}')
+        parser.add_argument('--users', type=int, default=50)
+        parser.add_argument('--posts', type=int, default=200)
+        parser.add_argument('--votes', type=int, default=1000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--plans', default=EXPECTED_PLANS,
+                            help='JSON file with expected plans')
+        parser.add_argument('--update', action='store_true',
+                            help='store current plans as expected')
+
+    def handle(self, *args, **options):
+        names = options['queries'] or list(QUERIES)
+        unknown = set(names) - set(QUERIES)
+        if unknown:
+            raise CommandError(f'Unknown queries {", ".join(unknown)}')
+
+        with isolated_database():
+            generate_dataset(options['users'], options['posts'],
+                             options['votes'], seed=options['seed'])
+            plans = {name: query_plan(name) for name in names}
+
+        expected = load_expected(options['plans'])
+        if options['update']:
+            expected.update(plans)
+            with open(options['plans'], 'w', encoding='utf-8') as stored:
+                json.dump(expected, stored, indent=1, sort_keys=True)
+                stored.write('\n')
+            self.stdout.write(self.style.SUCCESS(
+                f'Plans written to {options["plans"]}'
+            ))
+            return
+
+        regressions, changes = compare(plans, expected)
+        for change in changes:
+            self.stdout.write(f'Plan changed {change}')
+        if regressions:
+            raise CommandError('Full scans found:\n' + '\n'.join(regressions))
+        self.stdout.write(self.style.SUCCESS(
+            f'{len(plans)} query plans checked'
+        ))
@@ -0,0 +1,17 @@
+# -*- coding: UTF-8 -*-
+"""
+"""
+from django.core.management.base import BaseCommand
+
+from teste.models import PostCounterShard
+
+
+class Command(BaseCommand):
+    help = 'Add likes and dislikes from counter shards to their posts, ' \
+           'run periodically while posts have counter_shards enabled'
+
+    def handle(self, *args, **options):
+        folded = PostCounterShard.objects.fold()
+        self.stdout.write(self.style.SUCCESS(
+            f'Folded counter shards of {folded} posts'
+        ))
@@ -0,0 +1,41 @@
+# -*- coding: UTF-8 -*-
+"""
+"""
+import time
+
+from django.core.management.base import BaseCommand
+
+from teste.synthetic import generate_dataset
+
+
+class Command(BaseCommand):
+    help = 'Fill database with deterministic synthetic users, posts and votes'
+
+    def add_arguments(self, parser):
+        parser.add_argument('--users', type=int, default=1000)
+        parser.add_argument('--posts', type=int, default=10000)
+        parser.add_argument('--votes', type=int, default=100000)
+        parser.add_argument('--seed', type=int, default=0)
+        parser.add_argument('--zipf', type=float, default=1.1,
+                            help='skew of votes per post and posts per user')
+        parser.add_argument('--like-ratio', type=float, default=0.8)
+        parser.add_argument('--batch-size', type=int, default=5000)
+        parser.add_argument('--password', default='synthetic')
+
+    def handle(self, *args, **options):
+        started = time.monotonic()
+        created = generate_dataset(
+            options['users'],
+            options['posts'],
+            options['votes'],
+            seed=options['seed'],
+            exponent=options['zipf'],
+            like_ratio=options['like_ratio'],
+            batch_size=options['batch_size'],
+            password=options['password'],
+        )
+        self.stdout.write(self.style.SUCCESS(
+            'Created {users} users, {posts} posts, {votes} votes'.format(
+                **created
+            ) + f' in {time.monotonic() - started:.1f}s'
+        ))
@@ -0,0 +1,57 @@
+# Generated by Django 2.2.13 on 2026-10-19 00:32
+
+from django.conf import settings
+from django.db import migrations, models
+from django.db.models import Count, Sum
+import django.db.models.deletion
+
+
+def fill_author_stats(apps, schema_editor):
+    AuthorStats = apps.get_model('teste', 'AuthorStats')
+    Post = apps.get_model('teste', 'Post')
+    Vote = apps.get_model('teste', 'Vote')
+
+    stats = {}
+    posts = Post.objects.order_by().values('author').annotate(
+        posts=Count('id'), likes=Sum('likes'), dislikes=Sum('dislikes')
+    )
+    for item in posts:
+        stats[item['author']] = AuthorStats(
+            user_id=item['author'],
+            posts_count=item['posts'],
+            likes_received=item['likes'],
+            dislikes_received=item['dislikes'],
+        )
+    votes = Vote.objects.order_by().values('author').annotate(
+        votes=Count('id')
+    )
+    for item in votes:
+        entry = stats.setdefault(item['author'],
+                                 AuthorStats(user_id=item['author']))
+        entry.votes_cast = item['votes']
+    AuthorStats.objects.bulk_create(stats.values(), batch_size=500)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('auth', '0011_update_proxy_permissions'),
+        ('teste', '0005_auto_20190909_0828'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='AuthorStats',
+            fields=[
+                ('user', models.OneToOneField(on_delete=django.db.models.deletion.CASCADE, primary_key=True, related_name='stats', serialize=False, to=settings.AUTH_USER_MODEL)),
+                ('posts_count', models.IntegerField(db_index=True, default=0)),
+                ('likes_received', models.IntegerField(db_index=True, default=0)),
+                ('dislikes_received', models.IntegerField(db_index=True, default=0)),
+                ('votes_cast', models.IntegerField(db_index=True, default=0)),
+            ],
+            options={
+                'verbose_name_plural': 'author stats',
+            },
+        ),
+        migrations.RunPython(fill_author_stats, migrations.RunPython.noop),
+    ]
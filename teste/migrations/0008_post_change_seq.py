@@ -0,0 +1,25 @@
+# Generated by Django 2.2.13 on 2026-10-19 00:43
+
+from django.db import migrations, models
+from django.db.models import F
+
+
+def fill_change_seq(apps, schema_editor):
+    Post = apps.get_model('teste', 'Post')
+    Post.objects.update(change_seq=F('id'))
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teste', '0007_archived_vote'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='change_seq',
+            field=models.BigIntegerField(db_index=True, default=0, editable=False),
+        ),
+        migrations.RunPython(fill_change_seq, migrations.RunPython.noop),
+    ]
@@ -0,0 +1,32 @@
+# Generated by Django 2.2.13 on 2026-10-19 00:50
+
+from django.db import migrations, models
+import django.db.models.deletion
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teste', '0008_post_change_seq'),
+    ]
+
+    operations = [
+        migrations.AddField(
+            model_name='post',
+            name='counter_shards',
+            field=models.PositiveSmallIntegerField(default=0),
+        ),
+        migrations.CreateModel(
+            name='PostCounterShard',
+            fields=[
+                ('id', models.AutoField(auto_created=True, primary_key=True, serialize=False, verbose_name='ID')),
+                ('slot', models.PositiveSmallIntegerField()),
+                ('likes', models.IntegerField(default=0)),
+                ('dislikes', models.IntegerField(default=0)),
+                ('post', models.ForeignKey(on_delete=django.db.models.deletion.CASCADE, related_name='shards', to='teste.Post')),
+            ],
+            options={
+                'unique_together': {('post', 'slot')},
+            },
+        ),
+    ]
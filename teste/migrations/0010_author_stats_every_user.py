@@ -0,0 +1,27 @@
+# Generated by Django 2.2.13 on 2026-10-19 01:20
+
+from django.conf import settings
+from django.db import migrations
+
+
+def add_missing_author_stats(apps, schema_editor):
+    AuthorStats = apps.get_model('teste', 'AuthorStats')
+    User = apps.get_model(*settings.AUTH_USER_MODEL.split('.'))
+    AuthorStats.objects.bulk_create(
+        (AuthorStats(user_id=user_id) for user_id in
+         User.objects.filter(stats__isnull=True).values_list('pk', flat=True)),
+        batch_size=500
+    )
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teste', '0009_post_counter_shards'),
+        migrations.swappable_dependency(settings.AUTH_USER_MODEL),
+    ]
+
+    operations = [
+        migrations.RunPython(add_missing_author_stats,
+                             migrations.RunPython.noop),
+    ]
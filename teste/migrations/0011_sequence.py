@@ -0,0 +1,29 @@
+# Generated by Django 2.2.13 on 2026-10-19 01:09
+
+from django.db import migrations, models
+from django.db.models import Max
+
+
+def start_post_changes(apps, schema_editor):
+    Post = apps.get_model('teste', 'Post')
+    Sequence = apps.get_model('teste', 'Sequence')
+    last = Post.objects.aggregate(last=Max('change_seq'))['last'] or 0
+    Sequence.objects.create(name='posts', value=last)
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teste', '0010_author_stats_every_user'),
+    ]
+
+    operations = [
+        migrations.CreateModel(
+            name='Sequence',
+            fields=[
+                ('name', models.CharField(max_length=50, primary_key=True, serialize=False)),
+                ('value', models.BigIntegerField(default=0)),
+            ],
+        ),
+        migrations.RunPython(start_post_changes, migrations.RunPython.noop),
+    ]
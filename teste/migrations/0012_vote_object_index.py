@@ -0,0 +1,21 @@
+# Generated by Django 2.2.13 on 2026-10-19 01:23
+
+from django.db import migrations, models
+
+
+class Migration(migrations.Migration):
+
+    dependencies = [
+        ('teste', '0011_sequence'),
+    ]
+
+    operations = [
+        migrations.AddIndex(
+            model_name='archivedvote',
+            index=models.Index(fields=['content_type', 'object_id', 'author'], name='teste_archi_content_70d71c_idx'),
+        ),
+        migrations.AddIndex(
+            model_name='vote',
+            index=models.Index(fields=['content_type', 'object_id', 'author'], name='teste_vote_content_1b776e_idx'),
+        ),
+    ]
@@ -1,11 +1,20 @@
+import itertools
+import random
+
 from django.contrib.auth.models import User
 from django.contrib.contenttypes.fields import GenericForeignKey, \
     GenericRelation
 from django.contrib.contenttypes.models import ContentType
-from django.db import models, transaction
-from django.db.models import F
+from django.db import IntegrityError, models, transaction
+from django.db.models import Count, Exists, F, OuterRef, Q, Subquery, \
+    Sum
+from django.db.models.functions import Coalesce
+from django.db.models.signals import post_save, pre_delete
+from django.dispatch import receiver
 from django.utils.text import slugify
 
+from . import events
+
 
 VOTE_CHOICES = (
     (+1, '+1'),
@@ -13,6 +22,107 @@ VOTE_CHOICES = (
 )
 
 
+class DuplicateVote(IntegrityError):
+    """Voter already has a live or archived vote for the object"""
+
+
+class DirtyFieldsMixin:
+    """Saves only fields changed since the instance was loaded
+
+    Saving a loaded instance without changes does nothing. Instances not
+    loaded from database are saved with all fields.
+    """
+
+    @classmethod
+    def from_db(cls, db, field_names, values):
+        instance = super().from_db(db, field_names, values)
+        instance._reset_loaded_values()
+        return instance
+
+    def _reset_loaded_values(self):
+        # deferred fields are missing from __dict__ until they are loaded
+        self._loaded_values = {
+            field.attname: self.__dict__[field.attname]
+            for field in self._meta.concrete_fields
+            if field.attname in self.__dict__
+        }
+
+    def refresh_from_db(self, using=None, fields=None):
+        super().refresh_from_db(using, fields)
+        # reloaded values are what a later save has to compare against,
+        # deferred fields are loaded through here as well
+        loaded = getattr(self, '_loaded_values', {})
+        for field in self._meta.concrete_fields:
+            if field.attname in self.__dict__ and (
+                    fields is None or field.name in fields or
+                    field.attname in fields):
+                loaded[field.attname] = self.__dict__[field.attname]
+        self._loaded_values = loaded
+
+    def get_dirty_fields(self):
+        """Names of fields changed since loading
+
+        :return: list or None when instance was not loaded from database
+        """
+        loaded = getattr(self, '_loaded_values', None)
+        if loaded is None:
+            return None
+        return [
+            field.attname for field in self._meta.concrete_fields
+            if not field.primary_key and field.attname in self.__dict__ and
+            (field.attname not in loaded or
+             self.__dict__[field.attname] != loaded[field.attname])
+        ]
+
+    def save(self, *args, **kwargs):
+        if not self._state.adding and not args and \
+                kwargs.get('update_fields') is None:
+            dirty = self.get_dirty_fields()
+            if dirty is not None:
+                if not dirty:
+                    return
+                kwargs['update_fields'] = dirty + [
+                    field.attname for field in self._meta.concrete_fields
+                    if getattr(field, 'auto_now', False)
+                ]
+        super().save(*args, **kwargs)
+        self._reset_loaded_values()
+
+
+class SequenceManager(models.Manager):
+
+    def advance(self, name, amount=1):
+        """Increase the sequence creating it on first use
+
+        The row stays locked until the transaction ends, so values are
+        handed out in commit order and never repeat.
+
+        :return: expression of the new value for the same transaction
+        """
+        if not self.get_queryset().filter(name=name).update(
+                value=F('value') + amount):
+            self.create(name=name, value=amount)
+        return Subquery(
+            self.get_queryset().filter(name=name).values('value')[:1]
+        )
+
+    def current(self, name):
+        return self.get_queryset().filter(name=name).values_list(
+            'value', flat=True
+        ).first() or 0
+
+
+class Sequence(models.Model):
+    """Counter which only grows, unlike MAX() of rows which can be deleted"""
+    name = models.CharField(max_length=50, primary_key=True)
+    value = models.BigIntegerField(default=0)
+
+    objects = SequenceManager()
+
+    def __str__(self):
+        return f'{self.name}={self.value}'
+
+
 class VotesManager(models.Manager):
 
     def likes(self):
@@ -21,8 +131,14 @@ class VotesManager(models.Manager):
     def dislikes(self):
         return self.get_queryset().filter(vote__lt=0)
 
+    def voters(self):
+        """Authors with amount of their votes"""
+        return self.get_queryset().order_by().values('author').annotate(
+            amount=Count('id')
+        )
+
 
-class Vote(models.Model):
+class Vote(DirtyFieldsMixin, models.Model):
     vote = models.SmallIntegerField(choices=VOTE_CHOICES)
     author = models.ForeignKey(User, on_delete=models.CASCADE,
                                related_name='votes')
@@ -36,23 +152,57 @@ class Vote(models.Model):
     objects = VotesManager()
 
     class Meta:
-        pass
         #unique_together = (('author', 'content_type', 'object_id'),)
+        # votes of an object grouped by voter, e.g. when the object is
+        # deleted
+        indexes = [
+            models.Index(fields=['content_type', 'object_id', 'author']),
+        ]
 
     def __update_related_content_object(self, amount=1):
         field = 'likes'
         if self.vote < 0:
             field = 'dislikes'
         #  select_for_update ???
-        self.content_type.model_class().objects.filter(
-            pk=self.object_id
-        ).update(**{field: F(field) + amount})
+        model = self.content_type.model_class()
+        # new vote must not repeat the one moved to the archive, raising
+        # here rolls back its insert
+        voter_id = self.author_id if amount > 0 else None
+        if hasattr(model.objects, 'add_vote'):
+            owner_id = model.objects.add_vote(self.object_id, field, amount,
+                                              voter_id)
+        else:
+            if voter_id and ArchivedVote.objects.filter(
+                    author_id=voter_id, content_type_id=self.content_type_id,
+                    object_id=self.object_id).exists():
+                raise DuplicateVote('The vote already exists in archive')
+            objects = model.objects.filter(pk=self.object_id)
+            objects.update(**{field: F(field) + amount})
+            owner_id = objects.values_list('author_id', flat=True).first()
+        transaction.on_commit(lambda: events.counters.publish(
+            (self.content_type_id, self.object_id)
+        ))
+        AuthorStats.objects.bump(self.author_id, votes_cast=amount)
+        if owner_id:
+            AuthorStats.objects.bump(owner_id, **{f'{field}_received': amount})
 
     def save(self, *args, **kwargs):
         if not self._state.adding:
+            if self.get_dirty_fields() == []:
+                return
             raise ValueError("Updating the vote entry isn't allowed")
         with transaction.atomic():
-            super().save(*args, **kwargs)
+            try:
+                with transaction.atomic():
+                    super().save(*args, **kwargs)
+            except IntegrityError:
+                # unique constraint of the voter and the object in database
+                if Vote.objects.filter(
+                        author_id=self.author_id,
+                        content_type_id=self.content_type_id,
+                        object_id=self.object_id).exists():
+                    raise DuplicateVote('The vote already exists')
+                raise
             self.__update_related_content_object()
 
     def delete(self, *args, **kwargs):
@@ -64,7 +214,134 @@ class Vote(models.Model):
         return '{} on {}'.format(self.get_vote_display(), self.content_object)
 
 
-class Post(models.Model):
+class ArchivedVote(models.Model):
+    """Vote moved out of the votes table by teste.archiving"""
+    # primary key of the archived vote
+    id = models.IntegerField(primary_key=True)
+    vote = models.SmallIntegerField(choices=VOTE_CHOICES)
+    author = models.ForeignKey(User, on_delete=models.CASCADE,
+                               related_name='archived_votes')
+    content_type = models.ForeignKey(ContentType, on_delete=models.CASCADE)
+    object_id = models.PositiveIntegerField()
+    content_object = GenericForeignKey()
+
+    created_at = models.DateTimeField(db_index=True)
+    archived_at = models.DateTimeField(auto_now_add=True)
+
+    objects = VotesManager()
+
+    class Meta:
+        unique_together = (('author', 'content_type', 'object_id'),)
+        indexes = [
+            models.Index(fields=['content_type', 'object_id', 'author']),
+        ]
+
+    def __str__(self):
+        return '{} on {}'.format(self.get_vote_display(), self.content_object)
+
+
+class PostManager(models.Manager):
+    change_sequence = 'posts'
+
+    def last_change_seq(self):
+        return Sequence.objects.current(self.change_sequence)
+
+    def next_change_seq(self):
+        """Advance the change sequence
+
+        :return: expression of the new value to use inside an UPDATE
+        """
+        return Sequence.objects.advance(self.change_sequence)
+
+    def reserve_change_seq(self, amount=1):
+        """Advance the change sequence by amount values
+
+        :return: last reserved value
+        """
+        Sequence.objects.advance(self.change_sequence, amount)
+        return self.last_change_seq()
+
+    def add_vote(self, pk, field, amount, voter_id=None):
+        """Add amount to likes or dislikes of the post
+
+        Posts with counter_shards get the amount in a random shard, the
+        post row and its author stats are updated when shards are folded.
+        Their change_seq is not advanced either since the change sequence
+        row would be as hot as the post row, so such votes reach
+        PostViewSet.changes only after PostCounterShardManager.fold.
+
+        :param voter_id: author of a new vote, DuplicateVote is raised when
+            the voter already has an archived vote for the post
+        :return: id of post author to add the amount to or None
+        """
+        post = self.vote_target(pk, voter_id).first()
+        if not post:
+            return None
+        if post.get('archived_vote'):
+            raise DuplicateVote('The vote already exists in archive')
+        if post['counter_shards']:
+            PostCounterShard.objects.bump(
+                pk, random.randrange(post['counter_shards']),
+                **{field: amount}
+            )
+            return None
+        self.get_queryset().filter(pk=pk).update(**{
+            field: F(field) + amount,
+            'change_seq': self.next_change_seq(),
+        })
+        return post['author_id']
+
+    def vote_target(self, pk, voter_id=None):
+        """Post fields add_vote reads before changing counters
+
+        :param voter_id: author of a new vote, adds archived_vote flag
+            checked in the same query which reads the post
+        :return: values queryset
+        """
+        posts = self.get_queryset().filter(pk=pk)
+        fields = ['author_id', 'counter_shards']
+        if voter_id:
+            posts = posts.annotate(archived_vote=Exists(
+                ArchivedVote.objects.filter(
+                    author_id=voter_id, object_id=OuterRef('pk'),
+                    content_type=ContentType.objects.get_for_model(self.model)
+                )
+            ))
+            fields.append('archived_vote')
+        return posts.values(*fields)
+
+    def changed_since(self, cursor):
+        """Posts changed after the cursor in order of change
+
+        :param cursor: `<change_seq>:<id>` of the last seen post or a plain
+            change_seq
+        :raise ValueError: when cursor is malformed
+        :return: queryset
+        """
+        change_seq, _, post_id = cursor.partition(':')
+        changed = Q(change_seq__gt=int(change_seq))
+        if post_id:
+            # range on change_seq index without posts up to the cursor
+            changed = Q(change_seq__gte=int(change_seq)) & ~Q(
+                change_seq=int(change_seq), pk__lte=int(post_id)
+            )
+        return self.with_counters().filter(changed).order_by('change_seq',
+                                                             'pk')
+
+    def with_counters(self):
+        """Posts annotated with sums of not yet folded counter shards"""
+        shards = PostCounterShard.objects.filter(
+            post=OuterRef('pk')
+        ).order_by().values('post')
+        return self.get_queryset().annotate(**{
+            f'shard_{field}': Coalesce(Subquery(
+                shards.annotate(total=Sum(field)).values('total')
+            ), 0)
+            for field in ('likes', 'dislikes')
+        })
+
+
+class Post(DirtyFieldsMixin, models.Model):
     title = models.CharField(max_length=200, unique=True)
     slug = models.SlugField(max_length=200, unique=True,
                             default='', editable=False,)
@@ -74,9 +351,19 @@ class Post(models.Model):
     content = models.TextField()
     created_on = models.DateTimeField(auto_now_add=True, db_index=True)
     votes = GenericRelation(Vote)
+    archived_votes = GenericRelation(ArchivedVote)
 
     likes = models.PositiveIntegerField(default=0)
     dislikes = models.PositiveIntegerField(default=0)
+    # bumped on every change of the post or its counters, see
+    # PostViewSet.changes
+    change_seq = models.BigIntegerField(default=0, db_index=True,
+                                        editable=False)
+    # amount of PostCounterShard rows votes are spread over, 0 writes
+    # votes straight to likes and dislikes
+    counter_shards = models.PositiveSmallIntegerField(default=0)
+
+    objects = PostManager()
 
     class Meta:
         ordering = ['-created_on']
@@ -84,16 +371,197 @@ class Post(models.Model):
     def __str__(self):
         return self.title
 
+    @property
+    def total_likes(self):
+        return self.likes + self._shard_counters()[0]
+
+    @property
+    def total_dislikes(self):
+        return self.dislikes + self._shard_counters()[1]
+
+    def _shard_counters(self):
+        # annotated by PostManager.with_counters or loaded once
+        if 'shard_likes' not in self.__dict__:
+            self.shard_likes = self.shard_dislikes = 0
+            if self.pk and self.counter_shards:
+                totals = self.shards.aggregate(likes=Sum('likes'),
+                                               dislikes=Sum('dislikes'))
+                self.shard_likes = totals['likes'] or 0
+                self.shard_dislikes = totals['dislikes'] or 0
+        return self.shard_likes, self.shard_dislikes
+
     def _get_unique_slug(self):
         slug = slugify(self.title)
         unique_slug = slug
         num = 1
-        while Post.objects.filter(slug=unique_slug).exists():
+        others = Post.objects.exclude(pk=self.pk) if self.pk else Post.objects
+        while others.filter(slug=unique_slug).exists():
             unique_slug = '{}-{}'.format(slug, num)
             num += 1
         return unique_slug
 
     def save(self, *args, **kwargs):
-        if not self.slug:
+        dirty = self.get_dirty_fields()
+        if dirty == [] and not args and not kwargs.get('update_fields'):
+            return
+        if not self.slug or 'title' in (dirty or ()):
             self.slug = self._get_unique_slug()
-        super().save(*args, **kwargs)
+        if kwargs.get('update_fields') is not None:
+            kwargs['update_fields'] = [*kwargs['update_fields'], 'change_seq']
+        adding = self._state.adding
+        with transaction.atomic():
+            self.change_seq = Post.objects.reserve_change_seq()
+            super().save(*args, **kwargs)
+            if adding:
+                AuthorStats.objects.bump(self.author_id, posts_count=1)
+
+
+class PostCounterShardManager(models.Manager):
+
+    def bump(self, post_id, slot, **amounts):
+        """Add amounts to the shard creating the row on first use."""
+        updated = self.get_queryset().filter(post_id=post_id,
+                                             slot=slot).update(
+            **{field: F(field) + amount for field, amount in amounts.items()}
+        )
+        if not updated:
+            self.create(post_id=post_id, slot=slot, **amounts)
+
+    def fold(self):
+        """Move amounts of all shards into their posts and authors stats
+
+        Shards are decreased by the amounts read rather than zeroed so
+        votes written meanwhile are kept for the next fold.
+
+        :return: amount of posts which counters changed
+        """
+        shards = self.get_queryset().exclude(likes=0, dislikes=0).values(
+            'id', 'post', 'post__author', 'likes', 'dislikes'
+        )
+        folded = {}
+        with transaction.atomic():
+            for shard in shards:
+                self.get_queryset().filter(pk=shard['id']).update(
+                    likes=F('likes') - shard['likes'],
+                    dislikes=F('dislikes') - shard['dislikes']
+                )
+                post = folded.setdefault(shard['post'], {
+                    'author': shard['post__author'], 'likes': 0, 'dislikes': 0
+                })
+                post['likes'] += shard['likes']
+                post['dislikes'] += shard['dislikes']
+            for post_id, post in folded.items():
+                Post.objects.filter(pk=post_id).update(
+                    likes=F('likes') + post['likes'],
+                    dislikes=F('dislikes') + post['dislikes'],
+                    change_seq=Post.objects.next_change_seq()
+                )
+                AuthorStats.objects.bump(post['author'],
+                                         likes_received=post['likes'],
+                                         dislikes_received=post['dislikes'])
+        return len(folded)
+
+
+class PostCounterShard(models.Model):
+    """Part of likes and dislikes of a post with counter_shards enabled
+
+    Votes of a hot post update random shards instead of the single post
+    row, PostCounterShardManager.fold adds them back to the post.
+    """
+    post = models.ForeignKey(Post, on_delete=models.CASCADE,
+                             related_name='shards')
+    slot = models.PositiveSmallIntegerField()
+    # negative when removed votes outnumber the added ones
+    likes = models.IntegerField(default=0)
+    dislikes = models.IntegerField(default=0)
+
+    objects = PostCounterShardManager()
+
+    class Meta:
+        unique_together = (('post', 'slot'),)
+
+    def __str__(self):
+        return f'{self.post} #{self.slot}'
+
+
+class AuthorStatsManager(models.Manager):
+
+    def bump(self, user_id, **amounts):
+        """Add amounts to the counters of the user creating the row on
+        first use.
+        """
+        updated = self.get_queryset().filter(user_id=user_id).update(
+            **{field: F(field) + amount for field, amount in amounts.items()}
+        )
+        if not updated:
+            self.create(user_id=user_id, **amounts)
+
+    def rebuild(self):
+        """Recalculate all counters from the posts and votes tables."""
+        # every user has a row so leaderboards can join stats to users
+        stats = {user_id: self.model(user_id=user_id)
+                 for user_id in User.objects.values_list('pk', flat=True)}
+
+        def row(user_id):
+            return stats.setdefault(user_id, self.model(user_id=user_id))
+
+        posts = Post.objects.order_by().values('author').annotate(
+            posts=Count('id'), likes=Sum('likes'), dislikes=Sum('dislikes')
+        )
+        for item in posts:
+            entry = row(item['author'])
+            entry.posts_count = item['posts']
+            entry.likes_received = item['likes']
+            entry.dislikes_received = item['dislikes']
+        for model in (Vote, ArchivedVote):
+            votes = model.objects.order_by().values('author').annotate(
+                votes=Count('id')
+            )
+            for item in votes:
+                entry = row(item['author'])
+                entry.votes_cast += item['votes']
+
+        with transaction.atomic():
+            self.get_queryset().delete()
+            self.bulk_create(stats.values(), batch_size=500)
+
+
+class AuthorStats(models.Model):
+    user = models.OneToOneField(User, on_delete=models.CASCADE,
+                                primary_key=True, related_name='stats')
+    posts_count = models.IntegerField(default=0, db_index=True)
+    likes_received = models.IntegerField(default=0, db_index=True)
+    dislikes_received = models.IntegerField(default=0, db_index=True)
+    votes_cast = models.IntegerField(default=0, db_index=True)
+
+    objects = AuthorStatsManager()
+
+    class Meta:
+        verbose_name_plural = 'author stats'
+
+    def __str__(self):
+        return str(self.user)
+
+
+@receiver(pre_delete, sender=Post)
+def remove_post_stats(sender, instance, **kwargs):
+    # sent for queryset and cascade deletes too, votes are removed by the
+    # generic relation without Vote.delete, so take back what they
+    # contributed to the stats beforehand
+    counters = Post.objects.filter(pk=instance.pk).values(
+        'likes', 'dislikes'
+    ).first() or {'likes': 0, 'dislikes': 0}
+    for voter in itertools.chain(instance.votes.voters(),
+                                 instance.archived_votes.voters()):
+        AuthorStats.objects.bump(voter['author'],
+                                 votes_cast=-voter['amount'])
+    AuthorStats.objects.bump(instance.author_id,
+                             posts_count=-1,
+                             likes_received=-counters['likes'],
+                             dislikes_received=-counters['dislikes'])
+
+
+@receiver(post_save, sender=User)
+def create_author_stats(sender, instance, created, raw=False, **kwargs):
+    if created and not raw:
+        AuthorStats.objects.get_or_create(user=instance)
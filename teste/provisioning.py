@@ -0,0 +1,98 @@
+# -*- coding: UTF-8 -*-
+"""
+Fast creation of many users for load and test environments.
+"""
+import concurrent.futures
+import uuid
+
+from allauth.account.models import EmailAddress
+from django.contrib.auth.hashers import make_password
+from django.contrib.auth.models import User
+from django.db import transaction
+from django.utils.crypto import get_random_string
+from rest_framework_jwt.settings import api_settings
+
+from .models import AuthorStats
+
+
+def hash_passwords(passwords, processes=None):
+    """Hash passwords in a pool of processes
+
+    :param passwords: list of raw passwords
+    :param processes: amount of processes, 1 hashes in current process
+    :return: list of password hashes
+    """
+    if processes == 1 or len(passwords) < 2:
+        return [make_password(password) for password in passwords]
+    with concurrent.futures.ProcessPoolExecutor(processes) as executor:
+        return list(executor.map(make_password, passwords, chunksize=16))
+
+
+def insert_users(usernames, hashes):
+    """Insert users with given password hashes and their email records
+
+    :param usernames: list of usernames
+    :param hashes: list of password hashes
+    :return: list of saved users
+    """
+    users = [User(username=username, password=hashed,
+                  email=f'{username}@example.com')
+             for username, hashed in zip(usernames, hashes)]
+    with transaction.atomic():
+        User.objects.bulk_create(users)
+        # sqlite does not return primary keys from bulk inserts
+        ids = dict(User.objects.filter(
+            username__in=usernames
+        ).values_list('username', 'id'))
+        for user in users:
+            user.pk = ids[user.username]
+        EmailAddress.objects.bulk_create(
+            EmailAddress(user=user, email=user.email, primary=True)
+            for user in users
+        )
+        # bulk_create does not send post_save, see create_author_stats
+        AuthorStats.objects.bulk_create(
+            AuthorStats(user_id=user.pk) for user in users
+        )
+    return users
+
+
+def bulk_create_users(count, password=None, prefix='bot', batch_size=500,
+                      processes=None):
+    """Create users with email records and JWT tokens
+
+    When password is given its hash is computed once and shared by all
+    users, otherwise every user gets a random password.
+
+    :param count: amount of users
+    :param password: shared raw password
+    :param prefix: username prefix
+    :param batch_size: amount of users inserted per query
+    :param processes: amount of processes to hash passwords in
+    :return: list of dict with user details
+    """
+    if password:
+        passwords = [password] * count
+        hashes = hash_passwords([password]) * count
+    else:
+        passwords = [get_random_string(12) for _ in range(count)]
+        hashes = hash_passwords(passwords, processes)
+
+    jwt_payload = api_settings.JWT_PAYLOAD_HANDLER
+    jwt_encode = api_settings.JWT_ENCODE_HANDLER
+    result = []
+    for start in range(0, count, batch_size):
+        users = insert_users(
+            [f'{prefix}{uuid.uuid4().hex[:12]}'
+             for _ in range(min(batch_size, count - start))],
+            hashes[start:start + batch_size]
+        )
+        for user, raw in zip(users, passwords[start:start + batch_size]):
+            result.append({
+                'id': user.pk,
+                'username': user.username,
+                'email': user.email,
+                'password1': raw,
+                'token': jwt_encode(jwt_payload(user)),
+            })
+    return result
@@ -0,0 +1,222 @@
+# -*- coding: UTF-8 -*-
+"""
+EXPLAIN QUERY PLAN checks of the queries behind api views.
+"""
+import datetime
+import functools
+import json
+import os
+import re
+
+from django.contrib.auth.models import User
+from django.contrib.contenttypes.models import ContentType
+from django.test import RequestFactory
+from rest_framework.request import Request
+
+from api.views import AUTHOR_STATS_FIELDS, AuthorStatsOrderingFilter, \
+    PostViewSet, UserViewSet, VoteViewSet
+
+from .archiving import votes_to_archive
+from .models import ArchivedVote, Post, PostCounterShard, Vote
+
+EXPECTED_PLANS = os.path.join(os.path.dirname(__file__), 'query_plans.json')
+
+# plan lines reading a whole table or sorting rows without an index
+FULL_SCAN = re.compile(r'^SCAN \S+( AS \S+)?$|USE TEMP B-TREE')
+
+QUERIES = {}
+
+
+def query(func):
+    """Register query
+
+    Query function returns the queryset which plan is checked, it is called
+    against a database filled with synthetic data.
+    """
+    QUERIES[func.__name__] = func
+    return func
+
+
+def _exists(queryset):
+    # the same plan as QuerySet.exists() produces
+    return queryset.order_by().values('pk')[:1]
+
+
+def _vote():
+    return Vote.objects.order_by('pk').first()
+
+
+@query
+def users_list():
+    return UserViewSet.queryset
+
+
+def _users_ordered(ordering):
+    request = Request(RequestFactory().get('/', {'ordering': ordering}))
+    return AuthorStatsOrderingFilter().filter_queryset(
+        request, UserViewSet.queryset, UserViewSet()
+    )
+
+
+# leaderboards, users list with ?ordering= on stats fields
+for _field in AUTHOR_STATS_FIELDS:
+    QUERIES[f'users_by_{_field}'] = functools.partial(_users_ordered,
+                                                      f'-{_field}')
+    QUERIES[f'users_by_{_field}_asc'] = functools.partial(_users_ordered,
+                                                          _field)
+
+
+@query
+def users_retrieve():
+    return UserViewSet.queryset.filter(pk=User.objects.first().pk)
+
+
+@query
+def posts_list():
+    return PostViewSet.queryset
+
+
+@query
+def posts_retrieve():
+    return PostViewSet.queryset.filter(pk=Post.objects.first().pk)
+
+
+@query
+def posts_changes():
+    since = Post.objects.last_change_seq() // 2
+    return Post.objects.changed_since(
+        f'{since}:1'
+    )[:PostViewSet.max_changes_limit + 1]
+
+
+@query
+def posts_stream():
+    post_ids = Post.objects.values_list('pk', flat=True)[:10]
+    return Post.objects.with_counters().filter(
+        pk__in=list(post_ids)
+    ).order_by('pk')
+
+
+@query
+def post_slug_exists():
+    post = Post.objects.first()
+    return _exists(Post.objects.exclude(pk=post.pk).filter(slug=post.slug))
+
+
+@query
+def post_vote_counter():
+    # PostManager.add_vote for a new vote
+    vote = _vote()
+    return Post.objects.vote_target(vote.object_id, vote.author_id)
+
+
+@query
+def post_counter_shard():
+    return PostCounterShard.objects.filter(post_id=Post.objects.first().pk,
+                                           slot=0)
+
+
+@query
+def post_voters():
+    post = Post.objects.order_by('-likes').first()
+    return post.votes.voters()
+
+
+@query
+def post_archived_voters():
+    post = Post.objects.order_by('-likes').first()
+    return post.archived_votes.voters()
+
+
+@query
+def vote_exists():
+    vote = _vote()
+    return _exists(Vote.objects.filter(author_id=vote.author_id,
+                                       content_type_id=vote.content_type_id,
+                                       object_id=vote.object_id))
+
+
+@query
+def vote_archived_exists():
+    vote = _vote()
+    return _exists(ArchivedVote.objects.filter(
+        author_id=vote.author_id, content_type_id=vote.content_type_id,
+        object_id=vote.object_id
+    ))
+
+
+@query
+def votes_list():
+    return VoteViewSet.queryset
+
+
+@query
+def votes_retrieve():
+    return VoteViewSet.queryset.filter(pk=_vote().pk)
+
+
+@query
+def archived_votes_list():
+    return ArchivedVote.objects.all().order_by('-created_at')
+
+
+@query
+def archive_votes_batch():
+    older_than = _vote().created_at + datetime.timedelta(seconds=1)
+    return votes_to_archive(older_than)
+
+
+@query
+def content_type_lookup():
+    # ContentTypeManager.get_for_model before its cache is filled
+    return ContentType.objects.filter(app_label='teste', model='post')
+
+
+def query_plan(name):
+    """Get normalized query plan of registered query
+
+    :param name: name of registered query
+    :return: list of plan lines without node ids
+    """
+    lines = [re.sub(r'^\d+ \d+ \d+ ', '', line)
+             for line in QUERIES[name]().explain().splitlines()]
+    # SQLite before 3.36 writes SCAN TABLE and SEARCH TABLE
+    return [re.sub(r'^(SCAN|SEARCH) TABLE ', r'\1 ', line) for line in lines]
+
+
+def full_scans(plan):
+    """Plan lines reading whole table or sorting without index
+
+    :param plan: list of plan lines
+    :return: list of str
+    """
+    return [line for line in plan if FULL_SCAN.search(line)]
+
+
+def compare(plans, expected):
+    """Find queries which started scanning tables
+
+    Scans present in expected plan are accepted, other plan changes are
+    returned separately since they are not necessarily worse.
+
+    :param plans: dict of current plans by query name
+    :param expected: dict of stored plans by query name
+    :return: (regressions, changes) lists of messages
+    """
+    regressions, changes = [], []
+    for name, plan in plans.items():
+        stored = expected.get(name, [])
+        new_scans = [line for line in full_scans(plan)
+                     if line not in stored]
+        if new_scans:
+            regressions.append(f'{name}: {"; ".join(new_scans)}')
+        elif plan != stored:
+            changes.append(f'{name}: {"; ".join(plan)}')
+    return regressions, changes
+
+
+def load_expected(path=EXPECTED_PLANS):
+    if not os.path.isfile(path):
+        return {}
+    with open(path, encoding='utf-8') as stored:
+        return json.load(stored)
@@ -0,0 +1,192 @@
+# -*- coding: UTF-8 -*-
+"""
+Seeded generator of users, posts and votes written directly to database.
+"""
+import itertools
+import random
+import string
+
+from django.contrib.contenttypes.models import ContentType
+from django.db import transaction
+from django.utils.text import slugify
+
+from .models import AuthorStats, Post, Vote
+from .provisioning import hash_passwords, insert_users
+
+TEXT_CHARS = string.ascii_letters + string.digits + string.punctuation + ' '
+USERS_BATCH_SIZE = 500
+
+
+def random_text(rng, size, chars=TEXT_CHARS):
+    """Generate random string with single call to random generator
+
+    :param rng: random.Random instance
+    :param size: length of resulting string
+    :param chars: symbols to use
+    :return: str
+    """
+    return ''.join(rng.choices(chars, k=size))
+
+
+def zipf_cum_weights(size, exponent):
+    """Cumulative weights of Zipf distribution for random.choices
+
+    :param size: amount of ranks
+    :param exponent: skew, bigger values concentrate weight in first ranks
+    :return: list of float
+    """
+    return list(itertools.accumulate(
+        1 / rank ** exponent for rank in range(1, size + 1)
+    ))
+
+
+def _inserted_ids(model, last_id):
+    """Primary keys of rows inserted after last_id in insertion order"""
+    return list(model.objects.filter(pk__gt=last_id).order_by('pk')
+                .values_list('pk', flat=True))
+
+
+def _last_id(model):
+    last_id = model.objects.order_by('-pk').values_list('pk', flat=True)
+    return last_id.first() or 0
+
+
+def generate_users(amount, seed, password):
+    """Create users sharing one password hash
+
+    :return: list of user ids
+    """
+    hashes = hash_passwords([password])
+    user_ids = []
+    for start in range(0, amount, USERS_BATCH_SIZE):
+        size = min(USERS_BATCH_SIZE, amount - start)
+        usernames = [f'synthetic{seed}_{indx}'
+                     for indx in range(start, start + size)]
+        users = insert_users(usernames, hashes * size)
+        user_ids += [user.pk for user in users]
+    return user_ids
+
+
+def generate_posts(rng, amount, seed, user_ids, exponent, batch_size):
+    """Create posts with authors following Zipf distribution
+
+    :return: list of post ids
+    """
+    cum_weights = zipf_cum_weights(len(user_ids), exponent)
+    post_ids = []
+    for start in range(0, amount, batch_size):
+        size = min(batch_size, amount - start)
+        authors = rng.choices(user_ids, cum_weights=cum_weights, k=size)
+        posts = []
+        for indx, author_id in enumerate(authors, start=start):
+            words = random_text(rng, 16, string.ascii_lowercase)
+            title = f'synthetic {seed} {indx} {words}'
+            posts.append(Post(title=title, slug=slugify(title),
+                              author_id=author_id,
+                              content=random_text(rng, 1024)))
+        with transaction.atomic():
+            change_seq = Post.objects.reserve_change_seq(size) - size
+            for change_seq, post in enumerate(posts, start=change_seq + 1):
+                post.change_seq = change_seq
+            last_id = _last_id(Post)
+            Post.objects.bulk_create(posts)
+            post_ids += _inserted_ids(Post, last_id)
+    return post_ids
+
+
+def votes_per_post(rng, amount, posts, exponent, batch_size):
+    """Amount of votes of every post following Zipf distribution
+
+    :return: list of int by post rank
+    """
+    per_post = [0] * posts
+    cum_weights = zipf_cum_weights(posts, exponent)
+    for start in range(0, amount, batch_size):
+        for indx in rng.choices(range(posts), cum_weights=cum_weights,
+                                k=min(batch_size, amount - start)):
+            per_post[indx] += 1
+    return per_post
+
+
+def generate_votes(rng, per_post, user_ids, post_ids, like_ratio,
+                   batch_size):
+    """Create votes of posts by different users
+
+    :param per_post: amount of votes by post, see votes_per_post, must not
+        exceed amount of users since every user votes for a post once
+    :return: amount of created votes
+    """
+    content_type = ContentType.objects.get_for_model(Post)
+    created = 0
+    votes = []
+    counters = []
+    for post_id, size in zip(post_ids, per_post):
+        if not size:
+            continue
+        post = Post(pk=post_id, likes=0, dislikes=0)
+        for author_indx in rng.sample(range(len(user_ids)), size):
+            value = 1 if rng.random() < like_ratio else -1
+            if value > 0:
+                post.likes += 1
+            else:
+                post.dislikes += 1
+            votes.append(Vote(vote=value, author_id=user_ids[author_indx],
+                              content_type=content_type, object_id=post_id))
+        counters.append(post)
+        if len(votes) >= batch_size:
+            created += _flush_votes(votes, counters)
+            votes, counters = [], []
+    return created + _flush_votes(votes, counters)
+
+
+def _flush_votes(votes, counters):
+    with transaction.atomic():
+        change_seq = Post.objects.reserve_change_seq(len(counters)) - \
+            len(counters)
+        for change_seq, post in enumerate(counters, start=change_seq + 1):
+            post.change_seq = change_seq
+        Vote.objects.bulk_create(votes)
+        Post.objects.bulk_update(counters,
+                                 ['likes', 'dislikes', 'change_seq'],
+                                 batch_size=500)
+    return len(votes)
+
+
+def generate_dataset(users, posts, votes, seed=0, exponent=1.1,
+                     like_ratio=0.8, batch_size=5000, password='synthetic'):
+    """Fill database with deterministic synthetic data
+
+    The same seed produces the same data on an empty database. Rows are
+    inserted with bulk_create bypassing model save, counters of posts are
+    written from generated votes and author stats are rebuilt at the end.
+
+    Every user votes for a post once, so users beyond the requested
+    amount are created as voters when the most voted post needs more.
+
+    :param users: amount of users to author posts
+    :param posts: amount of posts
+    :param votes: amount of votes
+    :param seed: random seed, also part of usernames and titles
+    :param exponent: Zipf skew for post authors and votes per post
+    :param like_ratio: share of likes among votes
+    :param batch_size: amount of rows inserted per transaction
+    :param password: password shared by all users
+    :return: dict with amount of created rows
+    """
+    rng = random.Random(seed)
+    per_post = votes_per_post(rng, votes, posts, exponent, batch_size)
+    user_ids = []
+    if users > 0:
+        user_ids = generate_users(max(users, max(per_post, default=0)),
+                                  seed, password)
+    post_ids = []
+    if user_ids:
+        post_ids = generate_posts(rng, posts, seed, user_ids[:users],
+                                  exponent, batch_size)
+    created_votes = 0
+    if post_ids:
+        created_votes = generate_votes(rng, per_post, user_ids, post_ids,
+                                       like_ratio, batch_size)
+    AuthorStats.objects.rebuild()
+    return {'users': len(user_ids), 'posts': len(post_ids),
+            'votes': created_votes}
@@ -1,3 +1,147 @@
+from unittest import mock
+
+from django.contrib.auth.models import User
+from django.db.models import F
 from django.test import TestCase
+from rest_framework.test import APIClient
+
+from .models import AuthorStats, Post, PostCounterShard, Vote
+from .query_plans import QUERIES, compare, load_expected, query_plan
+from .synthetic import generate_dataset
+
+
+class DirtyFieldsTest(TestCase):
+
+    def setUp(self):
+        self.user = User.objects.create_user('author', 'author@example.com',
+                                             'password')
+        self.post = Post.objects.create(title='First post', content='text',
+                                        author=self.user)
+
+    def test_patch_persists_changed_fields(self):
+        client = APIClient()
+        client.force_authenticate(self.user)
+        response = client.patch(f'/api/v1/posts/{self.post.pk}/',
+                                {'content': 'changed'}, format='json')
+        self.assertEqual(response.status_code, 200)
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual(post.content, 'changed')
+        self.assertEqual(post.title, 'First post')
+        self.assertGreater(post.change_seq, self.post.change_seq)
+
+    def test_save_without_changes_does_nothing(self):
+        post = Post.objects.get(pk=self.post.pk)
+        with self.assertNumQueries(0):
+            post.save()
+
+    def test_save_after_refresh_keeps_concurrent_updates(self):
+        post = Post.objects.get(pk=self.post.pk)
+        Post.objects.filter(pk=post.pk).update(likes=7)
+        post.refresh_from_db()
+        self.assertEqual(post.get_dirty_fields(), [])
+
+        Post.objects.filter(pk=post.pk).update(likes=9)
+        post.content = 'changed'
+        post.save()
+        post = Post.objects.get(pk=post.pk)
+        self.assertEqual(post.likes, 9)
+        self.assertEqual(post.content, 'changed')
+
+    def test_loading_deferred_field_does_not_make_it_dirty(self):
+        post = Post.objects.defer('content').get(pk=self.post.pk)
+        self.assertEqual(post.content, 'text')
+        self.assertEqual(post.get_dirty_fields(), [])
+
+
+class AuthorStatsTest(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user('author', 'author@example.com',
+                                               'password')
+        self.voter = User.objects.create_user('voter', 'voter@example.com',
+                                              'password')
+        for indx in range(2):
+            post = Post.objects.create(title=f'Post {indx}', content='text',
+                                       author=self.author)
+            Vote.objects.create(content_object=post, vote=1,
+                                author=self.voter)
+
+    def _stats(self):
+        return list(AuthorStats.objects.order_by('pk').values())
+
+    def assertStatsRebuilt(self):
+        stats = self._stats()
+        AuthorStats.objects.rebuild()
+        self.assertEqual(stats, self._stats())
+
+    def test_queryset_delete_updates_stats(self):
+        Post.objects.filter(author=self.author).delete()
+        self.assertStatsRebuilt()
+        stats = AuthorStats.objects.get(pk=self.voter.pk)
+        self.assertEqual(stats.votes_cast, 0)
+
+
+class CounterShardsTest(TestCase):
+
+    def setUp(self):
+        self.author = User.objects.create_user('author', 'author@example.com',
+                                               'password')
+        self.post = Post.objects.create(title='Hot post', content='text',
+                                        author=self.author, counter_shards=1)
+        for indx, vote in enumerate((1, 1, -1)):
+            voter = User.objects.create_user(f'voter{indx}',
+                                             f'voter{indx}@example.com',
+                                             'password')
+            Vote.objects.create(content_object=self.post, vote=vote,
+                                author=voter)
+
+    def _stats(self):
+        return AuthorStats.objects.get(pk=self.author.pk)
+
+    def test_votes_wait_in_shards_until_fold(self):
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual((post.likes, post.dislikes), (0, 0))
+        self.assertEqual((post.total_likes, post.total_dislikes), (2, 1))
+        self.assertEqual(self._stats().likes_received, 0)
+
+        self.assertEqual(PostCounterShard.objects.fold(), 1)
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual((post.likes, post.dislikes), (2, 1))
+        self.assertEqual((post.total_likes, post.total_dislikes), (2, 1))
+        self.assertGreater(post.change_seq, self.post.change_seq)
+        stats = self._stats()
+        self.assertEqual((stats.likes_received, stats.dislikes_received),
+                         (2, 1))
+        self.assertEqual(PostCounterShard.objects.fold(), 0)
+
+    def test_fold_keeps_votes_written_meanwhile(self):
+        shards = PostCounterShard.objects
+        get_queryset = shards.get_queryset
+        calls = []
+
+        def get_queryset_after_read():
+            calls.append(1)
+            if len(calls) == 2:
+                # a vote lands after fold read the shards
+                get_queryset().update(likes=F('likes') + 1)
+            return get_queryset()
+
+        with mock.patch.object(shards, 'get_queryset',
+                               get_queryset_after_read):
+            shards.fold()
+        post = Post.objects.get(pk=self.post.pk)
+        self.assertEqual((post.likes, post.dislikes), (2, 1))
+        self.assertEqual(post.total_likes, 3)
+        self.assertEqual(self._stats().likes_received, 2)
+
+
+class QueryPlansTest(TestCase):
+
+    @classmethod
+    def setUpTestData(cls):
+        generate_dataset(20, 50, 200)
 
-# Create your tests here.
+    def test_no_new_full_scans(self):
+        plans = {name: query_plan(name) for name in QUERIES}
+        regressions, _ = compare(plans, load_expected())
+        self.assertEqual(regressions, [])
@@ -0,0 +1,21 @@
+# -*- coding: UTF-8 -*-
+"""
+"""
+from contextlib import contextmanager
+
+from django.db import connection
+
+
+@contextmanager
+def isolated_database(verbosity=0):
+    """Run code against freshly migrated test database
+
+    :param verbosity: verbosity of database creation
+    :return: None
+    """
+    old_name = connection.settings_dict['NAME']
+    connection.creation.create_test_db(verbosity=verbosity, autoclobber=True)
+    try:
+        yield
+    finally:
+        connection.creation.destroy_test_db(old_name, verbosity=verbosity)